@@ -1,11 +1,73 @@
+from array import array
+from collections import namedtuple
 import marstime
 
 
+birthdays_file = 'data/birthdays.tsv'
+
+Anniversary = namedtuple('Anniversary', ('name', 'on_mars', 'age', 'start', 'end'))
+
+
 def get_birthday_record(name, year, month, day):
     earth_dt = marstime.make_datetime_tup(year, month, day)
     mars_dt = marstime.MarsCal.from_earthtime(earth_dt)
     return name, marstime.format_date_tup(earth_dt), marstime.format_date_tup(mars_dt)
-    
+
+
+def read_birthdays(path=birthdays_file):
+    """(name, earth date, mars date) for each line written by get_birthday_record,
+    with the dates as (year, month, day) ints"""
+    with open(path, 'r') as fh:
+        for l in fh:
+            if l.strip():
+                name, earth_date, mars_date = l.strip('\n').split('\t')
+                yield (name, tuple(map(int, earth_date.split('-'))), tuple(map(int, mars_date.split('-'))))
+
+
+class AnniversaryIndex:
+    """Everyone's earth and mars birthdays over a number of years, as (start, end) earth
+    seconds sorted by start, so the birthdays in a window of time are found with a bisect.
+    The birth dates are already converted in the file, so building it is only arithmetic."""
+    def __init__(self, birthdays, first_earth_year, first_mars_year, years=3):
+        self.names = []
+        entries = []
+        for person, (name, earth, mars) in enumerate(birthdays):
+            self.names.append(name)
+            for year in range(first_earth_year, first_earth_year + years):
+                start = marstime.days_from_civil(year, earth[1], earth[2]) * 86400
+                entries.append((start, start + 86400, person, 0, year - earth[0]))
+            for year in range(first_mars_year, first_mars_year + years):
+                sol = marstime.MarsCal.to_marstime(marstime.MarsCal.make_date(year, mars[1], mars[2]))[0]
+                entries.append((marstime.MarsTime.to_earthseconds(sol),
+                                marstime.MarsTime.to_earthseconds(sol + 1), person, 1, year - mars[0]))
+        entries.sort()
+        self.starts = array('d', [e[0] for e in entries])
+        self.ends = array('d', [e[1] for e in entries])
+        self.people = array('l', [e[2] for e in entries])
+        self.on_mars = bytes([e[3] for e in entries])
+        self.ages = array('l', [e[4] for e in entries])
+        # A sol is the longest any birthday lasts
+        self.max_length = 88776
+
+    @staticmethod
+    def from_file(seconds_since_unix_epoch, years=3, path=birthdays_file):
+        """Index the birthdays file from the earth and mars years of the given time"""
+        earth_year = marstime.MarsTime.seconds_2_earthtime(seconds_since_unix_epoch).tm_year
+        mars_year = marstime.MarsCal.from_marstime(marstime.MarsTime.from_earthseconds(seconds_since_unix_epoch)).tm_year
+        return AnniversaryIndex(read_birthdays(path), earth_year, mars_year, years)
+
+    def upcoming(self, seconds_since_unix_epoch, sols=1):
+        """Birthdays that are on at some point between now and `sols` sols from now"""
+        until = seconds_since_unix_epoch + sols * 88775.244
+        i = marstime.bisect_right(self.starts, seconds_since_unix_epoch - self.max_length)
+        found = []
+        while i < len(self.starts) and self.starts[i] < until:
+            if self.ends[i] > seconds_since_unix_epoch:
+                found.append(Anniversary(self.names[self.people[i]], bool(self.on_mars[i]),
+                                         self.ages[i], self.starts[i], self.ends[i]))
+            i += 1
+        return found
+
 
 if __name__ == '__main__':
     birthdays = [
@@ -0,0 +1,65 @@
+"""Build step: wrap and pad the facts and events once, on the host, into data/messages.bin.
+The device then reads ready to draw lines with messages.MessageAsset.
+Events are looked up by their line in marsdates.tsv, so rebuild after editing the data files.
+
+    python compile_messages.py
+"""
+import os
+import struct
+from array import array
+
+import messages
+
+# The display font only has ascii
+ASCII_REPLACEMENTS = {'–': '-', '—': '-', '‘': "'", '’': "'", '“': '"', '”': '"'}
+
+
+def to_ascii(line):
+    for char, replacement in ASCII_REPLACEMENTS.items():
+        line = line.replace(char, replacement)
+    return line.encode('ascii', 'replace')
+
+
+def read_facts():
+    with open(messages.facts_file, 'r') as fh:
+        return [l.strip() for l in fh if l.strip()]
+
+
+def read_events():
+    """The earth and mars message of each event, in file order"""
+    events = []
+    with open(messages.events_file, 'r') as fh:
+        for l in fh:
+            earth_date, mars_date, msg = l.strip('\n').split('\t')
+            earth_year = earth_date.split('-', 1)[0] if earth_date else ''
+            mars_year = mars_date.split('-', 1)[0] if mars_date else ''
+            events.append((messages.format_earth_event(earth_year, msg),
+                           messages.format_mars_event(mars_year, earth_date, msg)))
+    return events
+
+
+def compile_messages(path=messages.asset_file):
+    line_length = messages.line_length
+    facts = sorted((messages.format_message(f) for f in read_facts()), key=len)
+    events = read_events()
+    paragraphs = facts + [messages.format_message(m) for event in events for m in event]
+
+    line_counts = bytes(len(p) for p in paragraphs)
+    offsets = array('I')
+    lines = bytearray()
+    for paragraph in paragraphs:
+        offsets.append(len(lines))
+        for line in paragraph:
+            lines.extend(to_ascii(line)[:line_length].ljust(line_length))
+
+    header = struct.pack(messages.MessageAsset.HEADER, messages.MessageAsset.MAGIC, line_length,
+                         max(line_counts), len(facts), len(events),
+                         os.stat(messages.facts_file)[6], os.stat(messages.events_file)[6])
+    with open(path, 'wb') as fh:
+        for part in (header, line_counts, offsets, lines):
+            fh.write(part)
+    return len(paragraphs)
+
+
+if __name__ == '__main__':
+    print(f'Compiled {compile_messages()} messages into {messages.asset_file}')
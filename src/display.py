@@ -39,6 +39,8 @@ class Display:
         # print(self.ds3231.get_time())
 
         self.demo_mode = False
+        # Clock formats, indexed by demo_mode
+        self.clock_formats = (marstime.DateFormat('%H:%M'), marstime.DateFormat('%H:%M:%S'))
         self.margin = 16
 
         # Solar Widget
@@ -46,22 +48,40 @@ class Display:
         self.solar_position = 200 - (self.solar_size // 2), 10
         self.solar_widget = SolarWidget(self.solar_size, self.solar_position)
 
+        # Mars time is tracked by a ticker so the loop can wait for the next change
+        self.ticker = marstime.MarsTicker(0)
         self.earth_time, self.mars_time = self._get_times()
+        self.next_event_ms = time.ticks_ms()
 
         self.krungthep_writer = Writer(self.epd, font_krungthep14)
+        # Messages for the coming mars hours, filled in while the loop is idle
+        self.message_queue = messages.MessageQueue()
 
     def _time_diff_mask(self):
         et, mt = self._get_times()
-        mask = [marstime.compare_datetimes(self.earth_time, et),
-                marstime.compare_datetimes(self.mars_time, mt)]
+        mask = (marstime.diff_datetimes(self.earth_time, et),
+                marstime.diff_datetimes(self.mars_time, mt))
         self.earth_time, self.mars_time = et, mt
         return mask
 
     def _get_times(self):
         et = marstime.DateTimeTup(*self.ds3231.get_time())
-        mt = marstime.MarsCal.from_earthtime(et)
+        # When the RTC was read, the next event is scheduled from here
+        self.times_ms = time.ticks_ms()
+        mt = self.ticker.sync(marstime.MarsTime.earthtime_2_seconds(et))
         return et, mt
 
+    def _schedule_next_event(self):
+        """Work out when the next minute (or second in demo mode) starts on either clock.
+        The RTC only has whole seconds, so wake up a second early and poll from there."""
+        unit = 'second' if self.demo_mode else 'minute'
+        size = self.ticker.UNITS[unit]
+        now = self.ticker.earth_seconds
+        next_event = min((now // size + 1) * size, self.ticker.next_boundary(unit)) - 1
+        wait_ms = int((next_event - now) * 1000)
+        # Time spent since the RTC was read, e.g. on a refresh, counts towards the wait
+        self.next_event_ms = time.ticks_add(self.times_ms, max(10, wait_ms))
+
     def _draw_solar_system(self):
         earth_days = self.earth_time.tm_yday
         mars_days = self.mars_time.tm_yday
@@ -80,27 +100,22 @@ class Display:
     def draw_time(self):
         ltext = self.margin
         rtext = 400 - (ltext + (16 * 8))
-        if self.demo_mode:
-            fmt = '{tm_hour:0>2d}:{tm_min:0>2d}:{tm_sec:0>2d}'
-        else:
-            fmt = '{tm_hour:0>2d}:{tm_min:0>2d}'#:{tm_sec:0>2d}'
-        earth_clock = fmt.format(tm_hour=self.earth_time.tm_hour,
-                                 tm_min=self.earth_time.tm_min,
-                                 tm_sec=self.earth_time.tm_sec)
-
-        mars_clock = fmt.format(tm_hour=self.mars_time.tm_hour,
-                                 tm_min=self.mars_time.tm_min,
-                                 tm_sec=self.mars_time.tm_sec)
+        fmt = self.clock_formats[self.demo_mode]
+        earth_clock = fmt(self.earth_time)
+        mars_clock = fmt(self.mars_time)
 
         y = 42
         c_x = ltext + (((200 - 30)-ltext)/2)
-        self.write_centered_str(c_x, y, earth_clock)
-        self.write_centered_str(400 - c_x, y, mars_clock)
+        x_start = self.write_centered_str(c_x, y, earth_clock)
+        x_end = self.write_centered_str(400 - c_x, y, mars_clock) + 13 * len(mars_clock)
+        # The rectangle covering both clocks, the font is 13 wide and 14 high
+        return x_start, y, x_end - x_start, 14
 
     def write_centered_str(self, center_x, y, text):
         x = int(center_x - (( 13 * len(text) ) / 2))
         self.krungthep_writer.set_textpos(self.epd, y, x)
         self.krungthep_writer.printstring(text, invert=True)
+        return x
 
     def draw_mirrored_hline(self, x_start, x_end, y):
         self.epd.line(x_start, y, x_end, y, CK)
@@ -158,8 +173,7 @@ class Display:
 
     def update_time(self):
         self.epd.set_partial_update()
-        self.draw_time()
-        self.epd.show()
+        self.epd.show_region(*self.draw_time())
 
     def refresh_time(self):
         self.epd.set_full_update()
@@ -172,8 +186,8 @@ class Display:
         self._draw_solar_system()
         self.draw_date_info()
 
-        msgs = messages.select_messages(self.earth_time, self.mars_time)
-        if msgs is None:
+        paragraphs = self.message_queue.get(self.earth_time, self.mars_time)
+        if paragraphs is None:
             starmaps=[
             'bootes','cepheus', 'draco',
             'gemini', 'orion', 'ursaminor'
@@ -181,7 +195,6 @@ class Display:
             constellation=random.choice(starmaps)
             constellationwidget.draw_star_chart(self.epd, (15, 85), constellation)
         else:
-            paragraphs = [messages.format_message(m) for m in msgs]
             self.draw_messages(paragraphs)
         self.epd.show()
 
@@ -205,36 +218,46 @@ class Display:
                 print('Both pressed, shutting down')
                 break
 
-            if key_state['key0'][0]:
+            if key_state['key0'][0] and not self.demo_mode:
                 self.demo_mode = True
+                self.next_event_ms = time.ticks_ms()
+
+            # Nothing can have changed before the next scheduled event
+            if time.ticks_diff(self.next_event_ms, time.ticks_ms()) > 0:
+                # Use the spare time to get the next messages ready
+                if not self.message_queue.precompute(self.mars_time):
+                    time.sleep_ms(10)
+                continue
 
+            # Bitmasks of the changed fields on each clock
             em, mm = self._time_diff_mask()
-            # 0:year, 1:mon, 2:mday, 3:hour, 4:min, 5:sec
-            # If there's an update to 0:year, 1:mon, 2:mday,
-            if not all(em[:3]) or not all(mm[:3]):
+            changed = em | mm
+            # If there's an update to the year, month or day
+            if changed & marstime.DIFF_DATE:
                 self.update_all()
             # If demo mode is enabled:
             elif self.demo_mode:
                 # Update messages every martian minute
-                if not mm[4]:
+                if mm & marstime.DIFF_MIN:
                     self.update_all()
                 # Full refresh the screen if the hour or minute changes 
-                elif not all([em[3], em[4], mm[3], mm[4]]):
+                elif changed & (marstime.DIFF_HOUR | marstime.DIFF_MIN):
                     self.refresh_time()
                 # Partial update of the time if the second changes
-                elif not em[5] or not mm[5]:
+                elif changed & marstime.DIFF_SEC:
                     self.update_time()
             else:
                 # Update the messages if the mars hour changes
-                if not mm[3]:
+                if mm & marstime.DIFF_HOUR:
                     self.update_all()
                 # Full refresh of the screen on the hour
-                elif not em[3] or not mm[3]:
+                elif changed & marstime.DIFF_HOUR:
                     self.refresh_time()
                 # Partial update of screen on the minute
-                elif not em[4] or not mm[4]:
+                elif changed & marstime.DIFF_MIN:
                     self.update_time()
 
+            self._schedule_next_event()
             time.sleep_ms(10)
 
 
@@ -333,6 +333,38 @@ class EPD(framebuf.FrameBuffer):
         self._busy = False
         self.display_refresh()
 
+    def show_region(self, x, y, w, h):
+        """Send and refresh only a window of the panel, widened to whole bytes.
+        Use with set_partial_update(), the rest of the panel is left as it is."""
+        x0 = max(0, x) // 8
+        x1 = (min(_EPD_WIDTH, x + w) + 7) // 8
+        y0 = max(0, y)
+        y1 = min(_EPD_HEIGHT, y + h)
+        if x1 <= x0 or y1 <= y0:
+            return
+        if self._busy:
+            raise RuntimeError("Cannot refresh: display is busy.")
+        self._busy = True
+        bw = x1 - x0
+        window = bytearray(bw * (y1 - y0))
+        for i, row in enumerate(range(y0, y1)):
+            start = row * _BWIDTH + x0
+            window[i * bw:(i + 1) * bw] = self._mvb[start:start + bw]
+        if self.rotate:
+            # The buffer is sent reversed, so the window is mirrored on both axes
+            x0, x1 = _BWIDTH - x1, _BWIDTH - x0
+            y0, y1 = _EPD_HEIGHT - y1, _EPD_HEIGHT - y0
+        hrst, hred = x0 * 8, x1 * 8 - 1
+        vrst, vred = y0, y1 - 1
+        self._send_command(b"\x91")  # Partial in (PTIN)
+        # Partial window (PTL): horizontal start/end, vertical start/end, scan only inside
+        self._send_command(b"\x90", bytes((hrst >> 8, hrst & 0xf8, hred >> 8, hred & 0xff | 0x07,
+                                            vrst >> 8, vrst & 0xff, vred >> 8, vred & 0xff, 0x28)))
+        self._send_command(b"\x13", window, reverse=self.rotate)
+        self._busy = False
+        self.display_refresh()
+        self._send_command(b"\x92")  # Partial out (PTOUT)
+
 
     def sleep(self):
         self._send_command(b"\x50", b"\xf7") # Vcom and data interval setting (CDI)
@@ -0,0 +1,153 @@
+"""Events keyed by earth or mars month-day, in a sorted binary file that is read a block at
+a time, so timelines far bigger than the Pico's memory can be looked up with a bisect.
+Build it on the host from a file in the marsdates.tsv format:
+
+    python eventstore.py [data/marsdates.tsv] [data/events.bin]
+"""
+import struct
+from array import array
+import marstime
+
+
+events_store_file = 'data/events.bin'
+
+
+class EventStore:
+    """Layout: the HEADER, then each event's text as a uint16 length and the utf-8 tsv line.
+    At index_offset: the first key of each block of earth entries, the same for the mars
+    entries (uint16), then the earth entries and the mars entries. An entry is ENTRY: the
+    month*100+day key, the event's line in the tsv and the offset of its text, sorted by key
+    then line. Only the block keys are held in memory."""
+    HEADER = '<4sHIII'  # magic, entries per block, earth entries, mars entries, index offset
+    ENTRY = '<HII'
+    MAGIC = b'MEVT'
+
+    def __init__(self, path=events_store_file):
+        self._fh = open(path, 'rb')
+        header = self._fh.read(struct.calcsize(EventStore.HEADER))
+        if len(header) < struct.calcsize(EventStore.HEADER):
+            self._fh.close()
+            raise ValueError('Truncated event store')
+        magic, self.block_size, earth_count, mars_count, index_offset = struct.unpack(EventStore.HEADER, header)
+        if magic != EventStore.MAGIC:
+            self._fh.close()
+            raise ValueError('Not an event store')
+        self.counts = (earth_count, mars_count)
+        self.block_keys = []
+        self._fh.seek(index_offset)
+        for count in self.counts:
+            keys = array('H', bytes(2 * EventStore._blocks(count, self.block_size)))
+            self._fh.readinto(keys)
+            self.block_keys.append(keys)
+        entry_size = struct.calcsize(EventStore.ENTRY)
+        self._entries_start = (self._fh.tell(), self._fh.tell() + earth_count * entry_size)
+        if self._fh.seek(0, 2) < self._entries_start[1] + mars_count * entry_size:
+            self._fh.close()
+            raise ValueError('Truncated event store')
+        self._buf = bytearray(self.block_size * entry_size)
+        self._mvb = memoryview(self._buf)
+
+    @staticmethod
+    def _blocks(count, block_size):
+        return (count + block_size - 1) // block_size
+
+    @staticmethod
+    def date_key(month, mday):
+        return month * 100 + mday
+
+    def find(self, key, on_mars):
+        """(line, text offset) of the entries with a key, a block at a time"""
+        keys = self.block_keys[on_mars]
+        count = self.counts[on_mars]
+        entry_size = struct.calcsize(EventStore.ENTRY)
+        # The block before the first one starting after key-1 may end with key
+        block = max(0, marstime.bisect_right(keys, key - 1) - 1)
+        found = []
+        while block < len(keys) and keys[block] <= key:
+            first = block * self.block_size
+            n = min(self.block_size, count - first)
+            self._fh.seek(self._entries_start[on_mars] + first * entry_size)
+            self._fh.readinto(self._mvb[:n * entry_size])
+            for i in range(n):
+                entry_key, line, offset = struct.unpack_from(EventStore.ENTRY, self._buf, i * entry_size)
+                if entry_key == key:
+                    found.append((line, offset))
+                elif entry_key > key:
+                    return found
+            block += 1
+        return found
+
+    def read(self, offset):
+        """The earth date, mars date and message of the text at offset"""
+        self._fh.seek(offset)
+        length = struct.unpack('<H', self._fh.read(2))[0]
+        return str(self._fh.read(length), 'utf-8').split('\t')
+
+    def lookup(self, earth_date_now, mars_date_now):
+        """Like messages.lookup_dates: the (year, (line, earth date, message), on_mars)
+        of today's events, in file order, keeping the mars date when both match"""
+        found = {}
+        for on_mars, date in enumerate((earth_date_now, mars_date_now)):
+            for line, offset in self.find(EventStore.date_key(date.tm_mon, date.tm_mday), on_mars):
+                found[line] = offset, on_mars
+        events = []
+        for line in sorted(found):
+            offset, on_mars = found[line]
+            earth_date, mars_date, msg = self.read(offset)
+            year = (mars_date if on_mars else earth_date).split('-', 1)[0]
+            events.append((year, (line, earth_date, msg), bool(on_mars)))
+        return events
+
+    def close(self):
+        self._fh.close()
+
+
+def _parse_key(date):
+    """The month-day key of a year-month-day date, None if there isn't one"""
+    if not date:
+        return None
+    month, mday = date.split('-', 1)[1].split('-')
+    return EventStore.date_key(int(month), int(mday))
+
+
+def build_event_store(tsv_path, path=events_store_file, block_size=64):
+    """Stream a tsv of earth date, mars date, message lines into an event store,
+    returns the number of events"""
+    entries = ([], [])
+    events = 0
+    with open(tsv_path, 'r') as fh_in, open(path, 'wb') as fh:
+        fh.write(bytes(struct.calcsize(EventStore.HEADER)))
+        for line, l in enumerate(fh_in):
+            l = l.strip('\n')
+            if not l.strip():
+                continue
+            earth_date, mars_date, msg = l.split('\t')
+            offset = fh.tell()
+            text = l.encode('utf-8')
+            fh.write(struct.pack('<H', len(text)))
+            fh.write(text)
+            for on_mars, date in enumerate((earth_date, mars_date)):
+                key = _parse_key(date)
+                if key is not None:
+                    entries[on_mars].append((key, line, offset))
+            events += 1
+
+        index_offset = fh.tell()
+        for side in entries:
+            side.sort()
+            fh.write(array('H', [side[i][0] for i in range(0, len(side), block_size)]))
+        for side in entries:
+            for entry in side:
+                fh.write(struct.pack(EventStore.ENTRY, *entry))
+        fh.seek(0)
+        fh.write(struct.pack(EventStore.HEADER, EventStore.MAGIC, block_size,
+                             len(entries[0]), len(entries[1]), index_offset))
+    return events
+
+
+if __name__ == '__main__':
+    import sys
+    import messages
+    tsv_path = sys.argv[1] if len(sys.argv) > 1 else messages.events_file
+    path = sys.argv[2] if len(sys.argv) > 2 else events_store_file
+    print(f'Stored {build_event_store(tsv_path, path)} events in {path}')
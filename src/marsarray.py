@@ -0,0 +1,171 @@
+"""Batch versions of the marstime conversions on numpy arrays, for the host (needs numpy).
+Kept out of marstime so the Pico doesn't load them and importing marstime stays quick.
+Dates are marstime.DateTimeTup with an array in each field, and an mst is a tuple of
+sol day, hour, minute and second arrays."""
+import numpy as np
+
+from marstime import (DateTimeTup, DELTA_T_POLYNOMIALS, LEAP_SECONDS, LEAP_SECOND_STARTS, MarsCal, MarsTime,
+                      SECONDS_PER_YEAR, polynomial)
+
+
+# Only the length of the last month differs in a leap year, so one table covers both
+MONTH_STARTS = np.array(MarsCal.month_starts[0][:24])
+TAI_UTC = np.array([tai_utc for __, __, tai_utc in LEAP_SECONDS], dtype=np.float64)
+
+
+class MarsCalArray:
+    @staticmethod
+    def from_earthseconds(seconds_since_unix_epoch, precise=False, tt_utc=None):
+        """Turn an array of unix epoch seconds into a mars time tuple of arrays"""
+        mst = MarsTimeArray.from_earthseconds(seconds_since_unix_epoch, precise, tt_utc)
+        return MarsCalArray.from_marstime(mst)
+
+    @staticmethod
+    def from_marstime(mst):
+        """Array version of MarsCal.from_marstime"""
+        sol_day, hour, minute, second = mst
+        year, yearday = MarsCalArray.solday_2_year(sol_day)
+        month, mday = MarsCalArray.dayofyear_2_month(yearday)
+        weekday = mday % 7
+        return DateTimeTup(year, month, mday, hour, minute, second, weekday, yearday)
+
+    @staticmethod
+    def to_marstime(datetimetup):
+        """Array version of MarsCal.to_marstime"""
+        year = np.asarray(datetimetup.tm_year, dtype=np.int64)
+        sol_day = MarsCalArray.year_start(year) + MONTH_STARTS[np.asarray(datetimetup.tm_mon) - 1] + datetimetup.tm_mday - 1
+        return sol_day, datetimetup.tm_hour, datetimetup.tm_min, datetimetup.tm_sec
+
+    @staticmethod
+    def to_earthseconds(datetimetup):
+        """Array version of MarsCal.to_earthseconds"""
+        return MarsTime.to_earthseconds(*MarsCalArray.to_marstime(datetimetup))
+
+    @staticmethod
+    def make_date(year, month, mday, hour=0, minute=0, second=0):
+        """Array version of MarsCal.make_date"""
+        mday = np.asarray(mday)
+        yearday = MONTH_STARTS[np.asarray(month) - 1] + mday
+        return DateTimeTup(np.asarray(year), np.asarray(month), mday, hour, minute, second, mday % 7, yearday)
+
+    @staticmethod
+    def is_leap_year(year):
+        year = np.asarray(year)
+        return ((year % 2 == 1) | (year % 10 == 0)) & ~((year % 100 == 0) & (year % 500 != 0))
+
+    @staticmethod
+    def days_in_month(month, year):
+        month = np.asarray(month)
+        return np.where(month % 6 == 0, 27, 28) + ((month == 24) & MarsCalArray.is_leap_year(year))
+
+    @staticmethod
+    def timedelta(date_a, date_b):
+        """Array version of MarsCal.timedelta"""
+        years = np.asarray(date_b.tm_year) - date_a.tm_year
+        months = np.asarray(date_b.tm_mon) - date_a.tm_mon
+        sols = np.asarray(date_b.tm_mday) - date_a.tm_mday
+        borrow = sols < 0
+        prev_month = np.where(date_b.tm_mon > 1, np.asarray(date_b.tm_mon) - 1, 24)
+        prev_year = np.where(date_b.tm_mon > 1, date_b.tm_year, np.asarray(date_b.tm_year) - 1)
+        sols = sols + borrow * MarsCalArray.days_in_month(prev_month, prev_year)
+        months = months - borrow
+        wrap = months < 0
+        return years - wrap, months + 24 * wrap, sols
+
+    @staticmethod
+    def to_ordinal(datetimetup):
+        return MarsCalArray.to_marstime(datetimetup)[0]
+
+    @staticmethod
+    def from_ordinal(sol_day):
+        zeros = np.zeros_like(sol_day)
+        return MarsCalArray.from_marstime((sol_day, zeros, zeros, zeros))
+
+    @staticmethod
+    def add_months(datetimetup, months):
+        dt = datetimetup
+        year, month = np.divmod(np.asarray(dt.tm_year) * 24 + np.asarray(dt.tm_mon) - 1 + months, 24)
+        month += 1
+        mday = np.minimum(dt.tm_mday, MarsCalArray.days_in_month(month, year))
+        return MarsCalArray.make_date(year, month, mday, dt.tm_hour, dt.tm_min, dt.tm_sec)
+
+    @staticmethod
+    def add_years(datetimetup, years):
+        return MarsCalArray.add_months(datetimetup, np.asarray(years) * 24)
+
+    @staticmethod
+    def year_start(year):
+        """Array version of MarsCal.year_start"""
+        year = np.asarray(year, dtype=np.int64)
+        prev = year - 1
+        return 668 * year + ((prev + 1) // 2) + (prev // 10) - (prev // 100) + (prev // 500) - 94128
+
+    @staticmethod
+    def _split_cycle(sols, first, rest):
+        """Array version of MarsCal._split_cycle, `first` can also be an array"""
+        over = sols - first
+        short = over < 0
+        return np.where(short, 0, 1 + over // rest), np.where(short, sols, over % rest)
+
+    @staticmethod
+    def solday_2_year(sol_day):
+        """Array version of MarsCal.solday_2_year, see MarsCal._solday_2_year_cycles"""
+        sol_day = np.asarray(sol_day, dtype=np.int64)
+        cycle, sols = np.divmod(sol_day + 94129, 334296)
+        century, sols = MarsCalArray._split_cycle(sols, 66860, 66859)
+        decade, sols = MarsCalArray._split_cycle(sols, np.where(century > 0, 6685, 6686), 6686)
+        first = np.where((century > 0) & (decade == 0), 668, 669)
+        pair, rest = np.divmod(sols - first, 1337)
+        second_of_pair = rest >= 669
+        year = np.where(sols < first, 0, 1 + 2 * pair + second_of_pair)
+        sols = np.where(sols < first, sols, rest - 669 * second_of_pair)
+        return (500 * cycle) + (100 * century) + (10 * decade) + year, sols + 1
+
+    @staticmethod
+    def dayofyear_2_month(days):
+        """Array version of MarsCal.dayofyear_2_month, leap or not"""
+        month = np.maximum(np.searchsorted(MONTH_STARTS, np.asarray(days) - 1, side='right'), 1)
+        return month, days - MONTH_STARTS[month - 1]
+
+
+class MarsTimeArray:
+    @staticmethod
+    def j2kdelta_2_mst(j2kdelta):
+        # Same as MarsTime.j2kdelta_2_mst, but on a numpy array of j2k deltas
+        mst = j2kdelta / 1.0274912517 + 44796.0 - 9626e-7
+        hour = mst % 1 * 24
+        return (
+            mst.astype(np.int64),
+            hour.astype(np.int64),
+            (hour * 60.0).astype(np.int64) % 60,
+            (hour * 36e2).astype(np.int64) % 60,
+        )
+
+    @staticmethod
+    def tt_utc(seconds_since_unix_epoch):
+        """Array version of MarsTime.tt_utc, can be computed once and reused for each conversion"""
+        seconds = np.asarray(seconds_since_unix_epoch, dtype=np.float64)
+        i = np.searchsorted(LEAP_SECOND_STARTS, seconds, side='right') - 1
+        tt_utc = 32.184 + TAI_UTC[np.maximum(i, 0)]
+        if (i < 0).any():
+            year = 1970 + seconds / SECONDS_PER_YEAR
+            u = (year - 1820) / 100
+            delta_t = -20 + 32 * u * u
+            for start, t0, coefficients in DELTA_T_POLYNOMIALS:
+                delta_t = np.where(year >= start, polynomial(coefficients, year - t0), delta_t)
+            tt_utc = np.where(i < 0, delta_t, tt_utc)
+        return tt_utc
+
+    @staticmethod
+    def from_earthseconds(seconds_since_unix_epoch, precise=False, tt_utc=None):
+        """Get the mst for an array of unix epoch seconds.
+        Returns a tuple of sol day, hour, minute and second arrays.
+        If precise, or given a precomputed tt_utc array, correct for leap seconds."""
+        seconds = np.asarray(seconds_since_unix_epoch, dtype=np.float64)
+        if precise and tt_utc is None:
+            tt_utc = MarsTimeArray.tt_utc(seconds)
+        if tt_utc is not None:
+            j2kdelta = (seconds + tt_utc - MarsTime.TT_epoch_start) / 86400
+        else:
+            j2kdelta = (seconds - MarsTime.J2K_epoch_start) / 86400
+        return MarsTimeArray.j2kdelta_2_mst(j2kdelta)
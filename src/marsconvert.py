@@ -0,0 +1,170 @@
+"""Bulk conversion of earth timestamps to mars time, on the host (needs numpy).
+
+    python -m marstime [input] [--csv] [--chunk-size N] [--precise] [--processes N]
+
+Each input line is either seconds since the unix epoch, or an ISO date such as
+2020-12-14 or 2020-12-14T22:09:10Z (UTC). Each output line is the input followed by the
+sol, MTC and the Darian date, or by empty fields if it can't be parsed. Lines are read and converted a chunk at a time, so memory
+use doesn't grow with the size of the input.
+With --processes the input file is memory mapped and split into newline aligned byte
+ranges that are converted in a process pool, the output is written in input order."""
+import argparse
+import mmap
+import sys
+import time
+from itertools import islice
+from multiprocessing import Pool
+
+import numpy as np
+
+from marsarray import MarsCalArray, MarsTimeArray
+
+
+HEADER = ('earth', 'sol', 'mtc', 'year', 'month', 'mday', 'wday', 'yday')
+# Largest byte range handed to a worker, this bounds memory use per process
+RANGE_BYTES = 1 << 25
+
+
+def parse_line(line):
+    """Seconds since the unix epoch, NaN if the line isn't a time"""
+    try:
+        return float(line)
+    except ValueError:
+        pass
+    try:
+        return np.datetime64(line.rstrip('Z'), 's').astype(np.int64)
+    except ValueError:
+        return np.nan
+
+
+def parse_chunk(lines):
+    """Seconds since the unix epoch for each line, NaN where it can't be parsed"""
+    try:
+        return np.array(lines, dtype=np.float64)
+    except ValueError:
+        # Not all numbers, fall back to going line by line
+        return np.array([parse_line(line) for line in lines], dtype=np.float64)
+
+
+def convert_chunk(lines, sep='\t', precise=False):
+    """Convert a list of input lines into output text, returns the text and the number
+    of lines that couldn't be parsed"""
+    seconds = parse_chunk(lines)
+    bad = ~np.isfinite(seconds)
+    mst = MarsTimeArray.from_earthseconds(np.where(bad, 0, seconds), precise)
+    mars_time = MarsCalArray.from_marstime(mst)
+    template = sep.join(['%s', '%d', '%02d:%02d:%02d', '%d', '%d', '%d', '%d', '%d']) + '\n'
+    columns = [f.tolist() for f in mst] + [f.tolist() for f in (
+        mars_time.tm_year, mars_time.tm_mon, mars_time.tm_mday, mars_time.tm_wday, mars_time.tm_yday)]
+    rows = [template % row for row in zip(lines, *columns)]
+    for i in np.flatnonzero(bad).tolist():
+        rows[i] = lines[i] + sep * (len(HEADER) - 1) + '\n'
+    return ''.join(rows), int(bad.sum())
+
+
+def read_chunks(fh, chunk_size):
+    """Lists of up to chunk_size non-blank lines, stripped"""
+    lines = (line.strip() for line in fh)
+    lines = (line for line in lines if line)
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def convert(fh_in, fh_out, sep='\t', chunk_size=100000, precise=False, header=True):
+    """Convert every line of fh_in, returns the number of rows and of bad rows"""
+    if header:
+        fh_out.write(sep.join(HEADER) + '\n')
+    rows = bad = 0
+    for chunk in read_chunks(fh_in, chunk_size):
+        text, chunk_bad = convert_chunk(chunk, sep, precise)
+        fh_out.write(text)
+        rows += len(chunk)
+        bad += chunk_bad
+    return rows, bad
+
+
+def split_ranges(mm, parts):
+    """Split a buffer into about `parts` (start, end) byte ranges, each ending after a newline"""
+    size = len(mm)
+    step = max(1, size // parts)
+    ranges = []
+    start = 0
+    while start < size:
+        end = mm.find(b'\n', start + step - 1) + 1 if start + step < size else size
+        end = end or size
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def _convert_range(job):
+    """Worker: convert the lines in one byte range of the file"""
+    path, start, end, sep, chunk_size, precise = job
+    with open(path, 'rb') as fh:
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text = mm[start:end].decode()
+    lines = [line for line in (line.strip() for line in text.splitlines()) if line]
+    out = [convert_chunk(lines[i:i + chunk_size], sep, precise) for i in range(0, len(lines), chunk_size)]
+    return len(lines), sum(bad for __, bad in out), ''.join(text for text, __ in out)
+
+
+def convert_parallel(path, fh_out, processes, sep='\t', chunk_size=100000, precise=False, header=True):
+    """Convert a file in a pool of processes, returns the number of rows and of bad rows"""
+    if header:
+        fh_out.write(sep.join(HEADER) + '\n')
+    with open(path, 'rb') as fh:
+        if not fh.seek(0, 2):
+            return 0, 0
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            ranges = split_ranges(mm, max(processes, len(mm) // RANGE_BYTES + 1))
+    jobs = [(path, start, end, sep, chunk_size, precise) for start, end in ranges]
+    rows = bad = 0
+    with Pool(processes) as pool:
+        for n, n_bad, text in pool.imap(_convert_range, jobs):
+            fh_out.write(text)
+            rows += n
+            bad += n_bad
+    return rows, bad
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m marstime', description='Convert earth timestamps to mars time')
+    parser.add_argument('input', nargs='?', help='file of timestamps, one per line (default stdin)')
+    parser.add_argument('-o', '--output', help='output file (default stdout)')
+    parser.add_argument('--csv', action='store_true', help='comma separated output instead of tabs')
+    parser.add_argument('--chunk-size', type=int, default=100000, help='lines converted at a time')
+    parser.add_argument('--precise', action='store_true', help='correct for leap seconds')
+    parser.add_argument('--no-header', action='store_true', help="don't write the header line")
+    parser.add_argument('-j', '--processes', type=int, default=1,
+                        help='convert the input file in this many processes')
+    args = parser.parse_args(argv)
+    if args.processes > 1 and not args.input:
+        parser.error('--processes needs an input file')
+
+    sep = ',' if args.csv else '\t'
+    fh_out = open(args.output, 'w') if args.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        if args.processes > 1:
+            rows, bad = convert_parallel(args.input, fh_out, args.processes, sep, args.chunk_size,
+                                    args.precise, not args.no_header)
+        else:
+            fh_in = open(args.input, 'r') if args.input else sys.stdin
+            try:
+                rows, bad = convert(fh_in, fh_out, sep, args.chunk_size, args.precise, not args.no_header)
+            finally:
+                if args.input:
+                    fh_in.close()
+    finally:
+        if args.output:
+            fh_out.close()
+    elapsed = time.perf_counter() - start
+    print(f'{rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):.0f} rows/s), {bad} bad rows',
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
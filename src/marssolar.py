@@ -0,0 +1,113 @@
+"""Position of the sun as seen from Mars, following the NASA Mars24 algorithm:
+https://www.giss.nasa.gov/tools/mars24/help/algorithm.html
+Everything takes seconds since the unix epoch (UTC), either as a number or a numpy array."""
+import math
+from collections import namedtuple
+
+import marstime
+
+try:
+    import numpy as np
+    from marsarray import MarsTimeArray
+except ImportError:
+    np = None
+
+
+# JD 2451545.0 TT, 12:00 1 Jan 2000
+J2000_epoch_start = marstime.days_from_civil(2000, 1, 1) * 86400 + 43200
+
+# Perturbations by the other planets (B-3): amplitude (deg), period (julian years), phase (deg)
+PBS_AMPLITUDES = (0.0071, 0.0057, 0.0039, 0.0037, 0.0021, 0.0020, 0.0018)
+PBS_PERIODS = (2.2353, 2.7543, 1.1177, 15.7866, 2.1354, 2.4694, 32.8493)
+PBS_PHASES = (49.409, 168.173, 191.837, 21.736, 15.704, 95.528, 49.095)
+# Precomputed per term: radians per day and phase in radians
+PBS_RATES = tuple(math.radians(0.985626 / tau) for tau in PBS_PERIODS)
+PBS_OFFSETS = tuple(math.radians(phi) for phi in PBS_PHASES)
+
+# Northern hemisphere seasons, for each 90 degrees of Ls
+SEASONS = ('Spring', 'Summer', 'Autumn', 'Winter')
+
+SolarTup = namedtuple('SolarTup', ('ls', 'season', 'eot', 'mtc', 'lmst', 'ltst'))
+
+
+def _is_array(value):
+    return np is not None and not isinstance(value, (int, float))
+
+
+def j2000_delta(seconds_since_unix_epoch):
+    """Days of terrestrial time since J2000 (A-1 to A-5)"""
+    if _is_array(seconds_since_unix_epoch):
+        seconds = np.asarray(seconds_since_unix_epoch, dtype=np.float64)
+        tt_utc = MarsTimeArray.tt_utc(seconds)
+    else:
+        seconds = seconds_since_unix_epoch
+        tt_utc = marstime.MarsTime.tt_utc(seconds)
+    return (seconds + tt_utc - J2000_epoch_start) / 86400
+
+
+def _orbit(delta):
+    """Fictitious mean sun angle and the equation of center (B-1 to B-4), in degrees"""
+    m = np if _is_array(delta) else math
+    mean_anomaly = m.radians(19.3871 + 0.52402073 * delta)
+    alpha_fms = 270.3871 + 0.524038496 * delta
+    pbs = 0
+    for amplitude, rate, offset in zip(PBS_AMPLITUDES, PBS_RATES, PBS_OFFSETS):
+        pbs = pbs + amplitude * m.cos(rate * delta + offset)
+    nu_m = ((10.691 + 3.0e-7 * delta) * m.sin(mean_anomaly)
+            + 0.623 * m.sin(2 * mean_anomaly)
+            + 0.050 * m.sin(3 * mean_anomaly)
+            + 0.005 * m.sin(4 * mean_anomaly)
+            + 0.0005 * m.sin(5 * mean_anomaly)
+            + pbs)
+    return alpha_fms, nu_m
+
+
+def _equation_of_time(ls, nu_m):
+    m = np if _is_array(ls) else math
+    ls = m.radians(ls)
+    return 2.861 * m.sin(2 * ls) - 0.071 * m.sin(4 * ls) + 0.002 * m.sin(6 * ls) - nu_m
+
+
+def solar_longitude(seconds_since_unix_epoch):
+    """Areocentric solar longitude (Ls) in degrees, 0 is the northern spring equinox"""
+    alpha_fms, nu_m = _orbit(j2000_delta(seconds_since_unix_epoch))
+    return (alpha_fms + nu_m) % 360
+
+
+def season(ls):
+    """Index into SEASONS for a solar longitude"""
+    if _is_array(ls):
+        return (np.asarray(ls) % 360 // 90).astype(np.int64)
+    return int(ls % 360 // 90)
+
+
+def equation_of_time(seconds_since_unix_epoch):
+    """Equation of time in degrees, true solar time minus mean solar time"""
+    alpha_fms, nu_m = _orbit(j2000_delta(seconds_since_unix_epoch))
+    return _equation_of_time((alpha_fms + nu_m) % 360, nu_m)
+
+
+def solar_quantities(seconds_since_unix_epoch, west_longitude=0):
+    """Ls, season, equation of time (degrees), and MTC, local mean and local true solar time
+    (hours) at a longitude west of the Airy-0 meridian, sharing the intermediate terms"""
+    delta = j2000_delta(seconds_since_unix_epoch)
+    alpha_fms, nu_m = _orbit(delta)
+    ls = (alpha_fms + nu_m) % 360
+    eot = _equation_of_time(ls, nu_m)
+    # C-2 Coordinated mars time, as in MarsTime.j2kdelta_2_mst counted from JD 2451549.5
+    mtc = (24 * ((delta - 4.5) / 1.0274912517 + 44796.0 - 9626e-7)) % 24
+    lmst = (mtc - west_longitude * (24 / 360)) % 24
+    ltst = (lmst + eot * (24 / 360)) % 24
+    return SolarTup(ls, season(ls), eot, mtc, lmst, ltst)
+
+
+def local_true_solar_time(seconds_since_unix_epoch, west_longitude=0):
+    """Local true solar time in hours, at a longitude west of Airy-0"""
+    return solar_quantities(seconds_since_unix_epoch, west_longitude).ltst
+
+
+if __name__ == '__main__':
+    now = marstime.MarsTime.earthtime_2_seconds(marstime.EarthCal.now())
+    solar = solar_quantities(now)
+    print(solar)
+    print(f'Ls {solar.ls:.2f}, northern {SEASONS[solar.season].lower()}')
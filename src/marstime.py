@@ -1,7 +1,27 @@
 import time
 import math
+from array import array
 from collections import namedtuple
 
+try:
+    from bisect import bisect_right
+except ImportError:
+    def bisect_right(a, x, lo=0, hi=None):
+        """Fallback for MicroPython builds without the bisect module"""
+        hi = len(a) if hi is None else hi
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if x < a[mid]:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+try:
+    import mmap
+except ImportError:
+    mmap = None
+
 
 MARS_MONTHS = 'Darian'
 MARS_DAYS = 'Darian'
@@ -44,6 +64,61 @@ def compare_datetimes(time_a, time_b):
     return [a == b for a, b in zip(time_a, time_b)]
 
 
+# Bits of the mask returned by diff_datetimes and diff_packed, one per field
+DIFF_YEAR, DIFF_MON, DIFF_MDAY, DIFF_HOUR, DIFF_MIN, DIFF_SEC = 1, 2, 4, 8, 16, 32
+DIFF_DATE = DIFF_YEAR | DIFF_MON | DIFF_MDAY
+
+
+def diff_datetimes(time_a, time_b):
+    """Bitmask of the fields (year to second) that differ, without building any lists"""
+    mask = 0
+    if time_a[0] != time_b[0]:
+        mask |= DIFF_YEAR
+    if time_a[1] != time_b[1]:
+        mask |= DIFF_MON
+    if time_a[2] != time_b[2]:
+        mask |= DIFF_MDAY
+    if time_a[3] != time_b[3]:
+        mask |= DIFF_HOUR
+    if time_a[4] != time_b[4]:
+        mask |= DIFF_MIN
+    if time_a[5] != time_b[5]:
+        mask |= DIFF_SEC
+    return mask
+
+
+def pack_datetime(dt):
+    """Pack year to second into one int: 6 bits each for seconds and minutes,
+    5 bits each for hours, day of the month and month, the year above that.
+    Without the year it fits in a MicroPython small int."""
+    return ((((((dt[0] << 5) | dt[1]) << 5 | dt[2]) << 5 | dt[3]) << 6 | dt[4]) << 6) | dt[5]
+
+
+def unpack_datetime(packed):
+    """Inverse of pack_datetime, the weekday and day of year aren't kept"""
+    return (packed >> 27, (packed >> 22) & 31, (packed >> 17) & 31,
+            (packed >> 12) & 31, (packed >> 6) & 63, packed & 63)
+
+
+def diff_packed(packed_a, packed_b):
+    """Same as diff_datetimes for two packed times"""
+    changed = packed_a ^ packed_b
+    mask = 0
+    if changed >> 27:
+        mask |= DIFF_YEAR
+    if changed & 0x7c00000:
+        mask |= DIFF_MON
+    if changed & 0x3e0000:
+        mask |= DIFF_MDAY
+    if changed & 0x1f000:
+        mask |= DIFF_HOUR
+    if changed & 0xfc0:
+        mask |= DIFF_MIN
+    if changed & 0x3f:
+        mask |= DIFF_SEC
+    return mask
+
+
 def make_struct_time(tm_year, tm_mon, tm_mday, tm_hour=0, tm_min=0, tm_sec=0, *args):
     #return time.struct_time((tm_year, tm_mon, tm_mday, tm_hour, tm_min, tm_sec, 0, 1, -1))
     return (tm_year, tm_mon, tm_mday, tm_hour, tm_min, tm_sec, 0, 1, -1)
@@ -55,6 +130,32 @@ def make_struct_time(tm_year, tm_mon, tm_mday, tm_hour=0, tm_min=0, tm_sec=0, *a
 def make_datetime_tup(*args, **kwargs):
     return DateTimeTup(*make_struct_time(*args, **kwargs)[:8])
 
+def days_from_civil(year, month, day):
+    """Days since 1970-01-01 for a proleptic Gregorian date, without going through
+    time.mktime and the local timezone. Years are counted from March so the leap day
+    falls at the end, and repeat every 400 years (146097 days)."""
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    if month <= 2:
+        year -= 1
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + (9 if month <= 2 else -3)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+def civil_from_days(days):
+    """Inverse of days_from_civil, the (year, month, day) of days since 1970-01-01"""
+    days += 719468
+    era = days // 146097
+    day_of_era = days - era * 146097
+    year_of_era = (day_of_era - day_of_era // 1460 + day_of_era // 36524 - day_of_era // 146096) // 365
+    day_of_year = day_of_era - (365 * year_of_era + year_of_era // 4 - year_of_era // 100)
+    month = (5 * day_of_year + 2) // 153  # From March
+    day = day_of_year - (153 * month + 2) // 5 + 1
+    month += 3 if month < 10 else -9
+    return year_of_era + era * 400 + (month <= 2), month, day
+
 def format_date_tup(dt):
     return f'{dt.tm_year}-{dt.tm_mon:02d}-{dt.tm_mday:02d}'
 
@@ -65,7 +166,7 @@ class EarthCal:
     
     @staticmethod
     def print_datetime(earth_time):
-        return print_datetime(earth_time, EarthCal.date_names(earth_time))
+        return [fmt(earth_time) for fmt in EarthCal.datetime_formats]
     
     @staticmethod
     def date_names(datetimetup):
@@ -74,30 +175,113 @@ class EarthCal:
         return MONTHS[EARTH_MONTHS][month], DAYS[EARTH_DAYS][weekday]
 
 
+class SolCache:
+    """Keeps the calendar fields (year, month, mday, weekday, yday) of the last `size` sols,
+    they only change once a sol. The oldest sol is dropped first, size 0 disables it."""
+    def __init__(self, size=4):
+        self.size = size
+        self.clear()
+
+    def clear(self):
+        self._fields = {}
+        self._order = [None] * self.size
+        self._next = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, sol_day):
+        fields = self._fields.get(sol_day)
+        if fields is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return fields
+
+    def put(self, sol_day, fields):
+        if not self.size:
+            return
+        oldest = self._order[self._next]
+        if oldest is not None:
+            del self._fields[oldest]
+        self._order[self._next] = sol_day
+        self._next = (self._next + 1) % self.size
+        self._fields[sol_day] = fields
+
+
 class MarsCal:
+    # Optional year start table, see build_year_table
+    _year_table = None
+    _year_table_first = 0
+    # The mmap and its views when the table was loaded with one, to close on clear
+    _year_table_map = None
+    # Leap year flags for each year of a loaded table
+    year_table_leaps = None
+    # Calendar fields of recent sols, see from_marstime
+    sol_cache = SolCache()
+
     @staticmethod
     def now():
         return MarsCal.from_earthtime(EarthCal.now())
 
     @staticmethod
     def print_datetime(mars_time):
-        return print_datetime(mars_time, MarsCal.date_names(mars_time))
+        return [fmt(mars_time) for fmt in MarsCal.datetime_formats]
 
     @staticmethod
     def timedelta(date_a, date_b):
+        """Whole years, months and sols from date_a to date_b"""
         years = date_b.tm_year - date_a.tm_year
-        sols = date_b.tm_yday - date_a.tm_yday 
+        months = date_b.tm_mon - date_a.tm_mon
+        sols = date_b.tm_mday - date_a.tm_mday
         if sols < 0:
-            sols += 668
+            # Borrow the month before date_b
+            months -= 1
+            if date_b.tm_mon > 1:
+                sols += MarsCal.days_in_month(date_b.tm_mon - 1, date_b.tm_year)
+            else:
+                sols += MarsCal.days_in_month(24, date_b.tm_year - 1)
+        if months < 0:
+            months += 24
             years -= 1
-        return years, sols // 28, sols % 28
+        return years, months, sols
+
+    @staticmethod
+    def to_ordinal(datetimetup):
+        """The sol number of a date"""
+        return MarsCal.to_marstime(datetimetup)[0]
+
+    @staticmethod
+    def from_ordinal(sol_day, hour=0, minute=0, second=0):
+        return MarsCal.from_marstime((sol_day, hour, minute, second))
+
+    @staticmethod
+    def sols_between(date_a, date_b):
+        return MarsCal.to_ordinal(date_b) - MarsCal.to_ordinal(date_a)
 
     @staticmethod
-    def from_earthtime(datetimetup):
+    def add_sols(datetimetup, sols):
+        dt = datetimetup
+        return MarsCal.from_ordinal(MarsCal.to_ordinal(dt) + sols, dt.tm_hour, dt.tm_min, dt.tm_sec)
+
+    @staticmethod
+    def add_months(datetimetup, months):
+        """Move by whole months, the day is cut to the length of the new month"""
+        dt = datetimetup
+        year, month = divmod(dt.tm_year * 24 + dt.tm_mon - 1 + months, 24)
+        month += 1
+        mday = min(dt.tm_mday, MarsCal.days_in_month(month, year))
+        return MarsCal.make_date(year, month, mday, dt.tm_hour, dt.tm_min, dt.tm_sec)
+
+    @staticmethod
+    def add_years(datetimetup, years):
+        return MarsCal.add_months(datetimetup, years * 24)
+
+    @staticmethod
+    def from_earthtime(datetimetup, precise=False):
         """Turn an earth time tuple into a mars time tuple"""
         # Earth time to unix epoch to julian 2000 delta
         ##return mst_2_marstime(earthtime_2_mst(datetimetup))
-        mst = MarsTime.from_earthtime(datetimetup)
+        mst = MarsTime.from_earthtime(datetimetup, precise)
         return MarsCal.from_marstime(mst)
 
     @staticmethod
@@ -108,12 +292,67 @@ class MarsCal:
 
     @staticmethod
     def from_marstime(mst):
-        sol_day, hour, minute, second = mst
-        year, yearday = MarsCal.solday_2_year(sol_day)
-        month, mday = MarsCal.dayofyear_2_month(year, yearday)
-        weekday = mday % 7
+        sol_day, hour, minute, second = mst[:4]
+        fields = MarsCal.sol_cache.get(sol_day)
+        if fields is None:
+            year, yearday = MarsCal.solday_2_year(sol_day)
+            month, mday = MarsCal.dayofyear_2_month(year, yearday)
+            fields = (year, month, mday, mday % 7, yearday)
+            MarsCal.sol_cache.put(sol_day, fields)
+        year, month, mday, weekday, yearday = fields
         return DateTimeTup(year, month, mday, hour, minute, second, weekday, yearday)
 
+    @staticmethod
+    def iter_sols(start_sol, end_sol):
+        """Yield the date of each sol from start_sol up to end_sol (not included).
+        Only the first sol is converted, after that the calendar is stepped forward."""
+        if start_sol >= end_sol:
+            return
+        dt = MarsCal.from_marstime((start_sol, 0, 0, 0))
+        year, month, mday, yearday = dt.tm_year, dt.tm_mon, dt.tm_mday, dt.tm_yday
+        month_length = MarsCal.days_in_month(month, year)
+        for __ in range(start_sol, end_sol):
+            yield DateTimeTup(year, month, mday, 0, 0, 0, mday % 7, yearday)
+            mday += 1
+            yearday += 1
+            if mday > month_length:
+                mday = 1
+                month += 1
+                if month > 24:
+                    month = 1
+                    year += 1
+                    yearday = 1
+                month_length = MarsCal.days_in_month(month, year)
+
+    @staticmethod
+    def make_date(year, month, mday, hour=0, minute=0, second=0):
+        """Mars time tuple from the date fields, filling in the weekday and day of year"""
+        yearday = MarsCal.intercalculate_days(month, year) + mday
+        return DateTimeTup(year, month, mday, hour, minute, second, mday % 7, yearday)
+
+    @staticmethod
+    def to_marstime(datetimetup):
+        """Turn a mars time tuple back into the mst: sol day, hour, minute, seconds"""
+        year, month = datetimetup.tm_year, datetimetup.tm_mon
+        sol_day = MarsCal.year_start(year) + MarsCal.intercalculate_days(month, year) + datetimetup.tm_mday - 1
+        return sol_day, datetimetup.tm_hour, datetimetup.tm_min, datetimetup.tm_sec
+
+    @staticmethod
+    def to_earthseconds(datetimetup):
+        """Seconds since the unix epoch at the start of the given mars time.
+        Converting this exact instant back can round to the mars second before,
+        to_earthtime gives a whole second inside it."""
+        return MarsTime.to_earthseconds(*MarsCal.to_marstime(datetimetup))
+
+    @staticmethod
+    def to_earthtime(datetimetup):
+        """Turn a mars time tuple into an earth time tuple, the first whole earth second
+        inside the mars second, so that from_earthtime gives back the same mars time"""
+        # A mars second is 1.027 earth seconds, so rounding up from just after its start
+        # stays inside it
+        seconds = MarsCal.to_earthseconds(datetimetup) + 1e-3
+        return MarsTime.seconds_2_earthtime(-(-seconds // 1))
+
     @staticmethod
     def is_leap_year(year):
         """Determine if it's a leap year on mars"""
@@ -148,7 +387,9 @@ class MarsCal:
     @staticmethod
     def intercalculate_days(month, year):
         """Calculate the number of days to the start of this month"""
-        return sum([MarsCal.days_in_month(i, year) for i in range(1, month)])
+        if not (1 <= month <= 25):
+            raise ValueError('Month out of range')
+        return MarsCal.month_starts[MarsCal.is_leap_year(year)][month - 1]
 
     @staticmethod
     def year_start(year):
@@ -156,41 +397,175 @@ class MarsCal:
         mod = 94128
         return int(((668 * year) + MarsCal.intercalculate_year(year)) - mod)
 
+    @staticmethod
+    def build_year_table(first_year, last_year):
+        """Precompute the start sols of a range of years, solday_2_year will bisect
+        this table for sols within the range"""
+        MarsCal._year_table_first = first_year
+        MarsCal._year_table = array('i', [MarsCal.year_start(y) for y in range(first_year, last_year + 2)])
+
+    @staticmethod
+    def clear_year_table():
+        MarsCal._year_table = None
+        MarsCal.year_table_leaps = None
+        if MarsCal._year_table_map is not None:
+            mm, views = MarsCal._year_table_map
+            MarsCal._year_table_map = None
+            # The views have to go before the map can close
+            for view in views:
+                view.release()
+            mm.close()
+
+    @staticmethod
+    def write_year_table(path, first_year, last_year):
+        """Save a year start table for load_year_table. The file is int32s: the first year,
+        the number of years, the start sol of each year and of the year after the last.
+        Followed by a leap year flag byte for each year."""
+        years = range(first_year, last_year + 1)
+        header = array('i', [first_year, len(years)])
+        starts = array('i', [MarsCal.year_start(y) for y in range(first_year, last_year + 2)])
+        with open(path, 'wb') as fh:
+            fh.write(header)
+            fh.write(starts)
+            fh.write(bytes([int(MarsCal.is_leap_year(y)) for y in years]))
+
+    @staticmethod
+    def load_year_table(path):
+        """Use a table saved by write_year_table in solday_2_year, memory mapped where
+        possible. If the file isn't there, returns False and the arithmetic is used."""
+        try:
+            fh = open(path, 'rb')
+        except OSError:
+            return False
+        MarsCal.clear_year_table()
+        with fh:
+            if mmap is not None:
+                mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+                buf = memoryview(mm)
+                with buf[:8] as header:
+                    first_year, years = header.cast('i')
+                table = buf[8:12 + 4 * years].cast('i')
+                leaps = buf[12 + 4 * years:]
+                MarsCal._year_table_map = mm, (table, leaps, buf)
+            else:
+                header = array('i', [0, 0])
+                fh.readinto(header)
+                first_year, years = header
+                table = array('i', bytes(4 * (years + 1)))
+                fh.readinto(table)
+                leaps = fh.read()
+        MarsCal._year_table_first = first_year
+        MarsCal._year_table = table
+        MarsCal.year_table_leaps = leaps
+        return True
+
     @staticmethod
     def solday_2_year(sol_day):
         """For a given sol day calculate the mars year
-        There should be a better way but for now, take an educated guess,
-         if it's wrong, adjust as needed."""
-        year = int((sol_day + 94128) // 668.5)
-        for __ in range(10):
-            st, en = MarsCal.year_start(year), MarsCal.year_start(year+1)
-            #print(year, st, '<=', sol_day, '<', en, st <= sol_day < en)
-            if sol_day < st:
-                year -= 1
-                continue
-            if sol_day >= en:
-                year += 1
-                continue
-            break
+        Uses the year table if there is one covering the sol, otherwise
+         breaks the sol number down over the leap year cycles."""
+        table = MarsCal._year_table
+        if table is not None and table[0] <= sol_day < table[-1]:
+            i = bisect_right(table, sol_day) - 1
+            return MarsCal._year_table_first + i, (sol_day - table[i]) + 1
+        return MarsCal._solday_2_year_cycles(sol_day)
+
+    @staticmethod
+    def _split_cycle(sols, first, rest):
+        """Split sols into sub-cycles, where the first sub-cycle is `first` sols and the rest are `rest`"""
+        if sols < first:
+            return 0, sols
+        sols -= first
+        return 1 + sols // rest, sols % rest
+
+    @staticmethod
+    def _solday_2_year_cycles(sol_day):
+        """Leap years repeat every 500 years (334296 sols). Each cycle is 5 centuries,
+        the first has one more leap year (year 0 is divisible by 500, year 100 isn't).
+        Centuries are 10 decades, where the first decade is short a sol if its first
+        year is a century. Within a decade, year 0 and the odd years are leap years."""
+        cycle, sols = divmod(sol_day + 94129, 334296)
+        century, sols = MarsCal._split_cycle(sols, 66860, 66859)
+        decade, sols = MarsCal._split_cycle(sols, 6685 if century else 6686, 6686)
+        first = 668 if (century and not decade) else 669
+        if sols < first:
+            year = 0
         else:
-            raise ValueError('Error estimating year')
-        return year, (sol_day - MarsCal.year_start(year)) + 1
+            pair, sols = divmod(sols - first, 1337)
+            year = 1 + 2 * pair
+            if sols >= 669:
+                year += 1
+                sols -= 669
+        return (500 * cycle) + (100 * century) + (10 * decade) + year, sols + 1
 
     @staticmethod
     def dayofyear_2_month(year, days):
         """Convert day of year, to month and day"""
-        year_total = 0
-        for month in range(1, 25):
-            dim = MarsCal.days_in_month(month, year=year)
-            if year_total + dim >= days:
-                break
-            year_total += dim
-        return month, days-year_total
+        starts = MarsCal.month_starts[MarsCal.is_leap_year(year)]
+        month = bisect_right(starts, days - 1, 1, 24)
+        return month, days - starts[month - 1]
+
+
+def _month_starts(year):
+    starts = [0]
+    for month in range(1, 25):
+        starts.append(starts[-1] + MarsCal.days_in_month(month, year))
+    return tuple(starts)
+
+
+# Sols from the start of the year to the start of each month, indexed by is_leap_year.
+# The final entry is the length of the year.
+MarsCal.month_starts = (_month_starts(2), _month_starts(1))
+
+
+# TAI - UTC in seconds from the first of (year, month). Earlier dates use the first entry.
+LEAP_SECONDS = (
+    (1972, 1, 10), (1972, 7, 11), (1973, 1, 12), (1974, 1, 13), (1975, 1, 14), (1976, 1, 15),
+    (1977, 1, 16), (1978, 1, 17), (1979, 1, 18), (1980, 1, 19), (1981, 7, 20), (1982, 7, 21),
+    (1983, 7, 22), (1985, 7, 23), (1988, 1, 24), (1990, 1, 25), (1991, 1, 26), (1992, 7, 27),
+    (1993, 7, 28), (1994, 7, 29), (1996, 1, 30), (1997, 7, 31), (1999, 1, 32), (2006, 1, 33),
+    (2009, 1, 34), (2012, 7, 35), (2015, 7, 36), (2017, 1, 37),
+)
+LEAP_SECOND_STARTS = tuple(days_from_civil(y, m, 1) * 86400 for y, m, __ in LEAP_SECONDS)
+
+# Before 1972 TT - UTC is Delta T, from the Espenak and Meeus polynomials that Mars24 uses:
+# (first year, year t is counted from, coefficients of t^0, t^1, ...)
+DELTA_T_POLYNOMIALS = (
+    (1800, 1800, (13.72, -0.332447, 0.0068612, 0.0041116, -0.00037436, 0.0000121272, -0.0000001699, 0.000000000875)),
+    (1860, 1860, (7.62, 0.5737, -0.251754, 0.01680668, -0.0004473624, 1 / 233174)),
+    (1900, 1900, (-2.79, 1.494119, -0.0598939, 0.0061966, -0.000197)),
+    (1920, 1920, (21.20, 0.84493, -0.076100, 0.0020936)),
+    (1941, 1950, (29.07, 0.407, -1 / 233, 1 / 2547)),
+    (1961, 1975, (45.45, 1.067, -1 / 260, -1 / 718)),
+)
+DELTA_T_STARTS = tuple(start for start, __, __ in DELTA_T_POLYNOMIALS)
+SECONDS_PER_YEAR = 31556952  # Gregorian, 365.2425 days
+
+
+def polynomial(coefficients, t):
+    """Sum of coefficients[i] * t^i, t can also be a numpy array"""
+    result = 0
+    for c in reversed(coefficients):
+        result = result * t + c
+    return result
+
+
+def delta_t(year):
+    """TT - UT in seconds for a decimal year before 1972. Earlier than 1800 it's the long
+    term parabola, good to a few tens of seconds at best."""
+    if year < 1800:
+        u = (year - 1820) / 100
+        return -20 + 32 * u * u
+    __, t0, coefficients = DELTA_T_POLYNOMIALS[bisect_right(DELTA_T_STARTS, year) - 1]
+    return polynomial(coefficients, year - t0)
 
 
 class MarsTime:
-    J2K_epoch_start = time.mktime((2000, 1, 1, 12, 0, 0, 0, 0, 0))
-    J2K_epoch_start = J2K_epoch_start + 388736
+    # In precise mode the earth time is converted to terrestrial time (TT) first,
+    # then counted from JD 2451549.5 (2000-01-06 00:00) as in the Mars24 algorithm.
+    TT_epoch_start = days_from_civil(2000, 1, 6) * 86400
+    # J2K_epoch_start is the same, less a fixed 64 seconds for TT - UTC.
+    J2K_epoch_start = TT_epoch_start - 64
 
     @staticmethod
     def now():
@@ -210,23 +585,127 @@ class MarsTime:
         )
 
     @staticmethod
-    def from_earthtime(tm):
+    def from_earthtime(tm, precise=False):
         """Get the mst: sol day, hour, minute, seconds
         If sol day hasn't changed, no need to recalculate the marstime"""
-        tm = make_struct_time(*tm)
-        return MarsTime.from_earthseconds(time.mktime(tm))
-        
-    @staticmethod   
-    def from_earthseconds(seconds_since_unix_epoch):
+        return MarsTime.from_earthseconds(MarsTime.earthtime_2_seconds(tm), precise)
+
+    @staticmethod
+    def earthtime_2_seconds(tm):
+        """Earth time tuple (in UTC) to seconds since the unix epoch"""
+        tm_year, tm_mon, tm_mday, tm_hour, tm_min, tm_sec = make_struct_time(*tm)[:6]
+        return days_from_civil(tm_year, tm_mon, tm_mday) * 86400 + tm_hour * 3600 + tm_min * 60 + tm_sec
+
+    @staticmethod
+    def seconds_2_earthtime(seconds_since_unix_epoch):
+        """Inverse of earthtime_2_seconds, an earth time tuple like time.gmtime's
+        but the same on every port, whatever its epoch"""
+        days, seconds = divmod(int(seconds_since_unix_epoch // 1), 86400)
+        year, month, day = civil_from_days(days)
+        yearday = days - days_from_civil(year, 1, 1) + 1
+        # 1970-01-01 was a Thursday
+        return DateTimeTup(year, month, day, seconds // 3600, seconds // 60 % 60, seconds % 60, (days + 3) % 7, yearday)
+
+    @staticmethod
+    def tt_utc(seconds_since_unix_epoch):
+        """Terrestrial time - UTC in seconds, 32.184 plus the leap seconds (TAI - UTC)
+        from 1972, and Delta T before that"""
+        i = bisect_right(LEAP_SECOND_STARTS, seconds_since_unix_epoch) - 1
+        if i < 0:
+            return delta_t(1970 + seconds_since_unix_epoch / SECONDS_PER_YEAR)
+        return 32.184 + LEAP_SECONDS[i][2]
+
+    @staticmethod
+    def from_earthseconds(seconds_since_unix_epoch, precise=False):
         """Get the mst: sol day, hour, minute, seconds
-        If sol day hasn't changed, no need to recalculate the marstime"""
-        j2kdelta = (seconds_since_unix_epoch - MarsTime.J2K_epoch_start) / 86400
+        If precise, correct for leap seconds rather than a fixed TT - UTC"""
+        if precise:
+            j2kdelta = (seconds_since_unix_epoch + MarsTime.tt_utc(seconds_since_unix_epoch)
+                        - MarsTime.TT_epoch_start) / 86400
+        else:
+            j2kdelta = (seconds_since_unix_epoch - MarsTime.J2K_epoch_start) / 86400
         mst = MarsTime.j2kdelta_2_mst(j2kdelta)
         return mst
 
+    @staticmethod
+    def from_earthticks(ticks, per_second=1000):
+        """Fixed point version of from_earthseconds, no floats involved.
+        ticks are whole 1/per_second parts of a second since the unix epoch,
+        e.g. time.time_ns() // 1000000 for the default milliseconds.
+        Returns the mst with a fifth field, the part of the mars second in ticks"""
+        j2kdelta = ticks - MarsTime.J2K_epoch_start * per_second
+        # Earth days per sol is 1.0274912517 and the mars epoch offset is 44796 - 0.0009626 sols
+        # (3870374316.83136 seconds), over a common denominator so there's a single rounding
+        mars_ticks = ((j2kdelta * 1000000000000000 + 387037431683136 * per_second * 10274912517)
+                      // 1027491251700000)
+        sol_day, ticks = divmod(mars_ticks, 86400 * per_second)
+        seconds, fraction = divmod(ticks, per_second)
+        return sol_day, seconds // 3600, (seconds // 60) % 60, seconds % 60, fraction
+
+    @staticmethod
+    def earthseconds_2_marsseconds(seconds_since_unix_epoch):
+        """Mars seconds since the start of sol 0, the same scaling as j2kdelta_2_mst"""
+        return ((seconds_since_unix_epoch - MarsTime.J2K_epoch_start) / 1.0274912517
+                + (44796.0 - 9626e-7) * 86400)
+
+    @staticmethod
+    def marsseconds_2_earthseconds(mars_seconds):
+        """Inverse of earthseconds_2_marsseconds"""
+        return ((mars_seconds - (44796.0 - 9626e-7) * 86400) * 1.0274912517
+                + MarsTime.J2K_epoch_start)
+
+    @staticmethod
+    def to_earthseconds(sol_day, hour=0, minute=0, second=0):
+        """Seconds since the unix epoch at the start of the given mst.
+        Works equally on numpy arrays of each field."""
+        mars_seconds = sol_day * 86400 + hour * 3600 + minute * 60 + second
+        return MarsTime.marsseconds_2_earthseconds(mars_seconds)
+
+
+class MarsTicker:
+    """Keeps the last mars time and moves it along by elapsed earth seconds,
+    the calendar is only recalculated when the sol changes.
+    next_boundary gives the earth time that the next mars second, minute, hour or sol starts,
+    so a loop can wait for it instead of converting the time to see if it's changed."""
+    UNITS = {'second': 1, 'minute': 60, 'hour': 3600, 'sol': 86400}
+
+    def __init__(self, seconds_since_unix_epoch):
+        self.sync(seconds_since_unix_epoch)
+
+    def sync(self, seconds_since_unix_epoch):
+        """Reset from an earth time, e.g. a fresh read of the RTC"""
+        self.earth_seconds = seconds_since_unix_epoch
+        self.mars_seconds = MarsTime.earthseconds_2_marsseconds(seconds_since_unix_epoch)
+        self.mars_time = None
+        return self._update()
+
+    def advance(self, elapsed_seconds):
+        """Move on by a number of earth seconds"""
+        self.earth_seconds += elapsed_seconds
+        self.mars_seconds += elapsed_seconds / 1.0274912517
+        return self._update()
+
+    def next_boundary(self, unit='second'):
+        """Earth seconds since the unix epoch when the next mars `unit` starts"""
+        size = MarsTicker.UNITS[unit]
+        start = (self.mars_seconds // size + 1) * size
+        return self.earth_seconds + (start - self.mars_seconds) * 1.0274912517
+
+    def _update(self):
+        sol, sec = divmod(int(self.mars_seconds // 1), 86400)
+        hour, minute, second = sec // 3600, (sec // 60) % 60, sec % 60
+        mt = self.mars_time
+        if mt is None or sol != self.sol:
+            self.sol = sol
+            self.mars_time = MarsCal.from_marstime((sol, hour, minute, second))
+        else:
+            self.mars_time = DateTimeTup(
+                mt.tm_year, mt.tm_mon, mt.tm_mday, hour, minute, second, mt.tm_wday, mt.tm_yday)
+        return self.mars_time
+
+
 def print_datetime(dt, cal_names):
     month_name, day_name = cal_names
-    print(dt)
     return [
         f'{day_name}',
         f'{dt.tm_mday} {month_name}',
@@ -243,55 +722,56 @@ def time_to_period(hour):
     return f'{hr}{abrv}'
 
 
+class DateFormat:
+    """A strftime style pattern, compiled once into a str.format template.
+    %Y year, %m month, %d day of the month, %e day of the month without padding,
+    %H hour, %M minute, %S second, %j day of the year, %B month name, %A weekday name,
+    %P hour with am/pm (time_to_period), %% a percent sign.
+    Names come from cal.date_names, so a cal (EarthCal or MarsCal) is needed for %B and %A."""
+    DIRECTIVES = {
+        'Y': '{0}', 'm': '{1:02d}', 'd': '{2:02d}', 'e': '{2}', 'H': '{3:02d}', 'M': '{4:02d}',
+        'S': '{5:02d}', 'j': '{7:03d}', 'B': '{8}', 'A': '{9}', 'P': '{10}', '%': '%'}
+
+    def __init__(self, pattern, cal=None):
+        self.pattern = pattern
+        self.cal = cal
+        parts = []
+        directives = set()
+        i = 0
+        while i < len(pattern):
+            c = pattern[i]
+            if c == '%' and i + 1 < len(pattern):
+                directive = pattern[i + 1]
+                if directive not in DateFormat.DIRECTIVES:
+                    raise ValueError(f'Unknown directive %{directive}')
+                parts.append(DateFormat.DIRECTIVES[directive])
+                directives.add(directive)
+                i += 2
+                continue
+            parts.append('{{' if c == '{' else '}}' if c == '}' else c)
+            i += 1
+        self._template = ''.join(parts)
+        self._names = 'B' in directives or 'A' in directives
+        self._period = 'P' in directives
+        if self._names and cal is None:
+            raise ValueError('A calendar is needed for month and weekday names')
+
+    def __call__(self, dt):
+        month_name = day_name = period = ''
+        if self._names:
+            month_name, day_name = self.cal.date_names(dt)
+        if self._period:
+            period = time_to_period(dt[3])
+        return self._template.format(*(tuple(dt[:8]) + (month_name, day_name, period)))
+
+
+# Lines returned by print_datetime: weekday, day and month, time, date
+DATETIME_PATTERNS = ('%A', '%e %B', '%H:%M', '%Y/%m/%d')
+EarthCal.datetime_formats = tuple(DateFormat(p, EarthCal) for p in DATETIME_PATTERNS)
+MarsCal.datetime_formats = tuple(DateFormat(p, MarsCal) for p in DATETIME_PATTERNS)
+
+
 if __name__ == '__main__':
-    #earth_time = DateTimeTup(tm_year=2023, tm_mon=12, tm_mday=14, tm_hour=21, tm_min=54, tm_sec=49, tm_wday=3, tm_yday=0)
-
-    #earth_time = DateTimeTup(tm_year=2020, tm_mon=12, tm_mday=15, tm_hour=21, tm_min=29, tm_sec=23, tm_wday=3, tm_yday=0)
-
-    #DateTimeTup(tm_year=220, tm_mon=13, tm_mday=11, tm_hour=22, tm_min=41, tm_sec=15, tm_wday=4, tm_yday=345)
-    #DateTimeTup(tm_year=2023, tm_mon=12, tm_mday=14, tm_hour=21, tm_min=29, tm_sec=27, tm_wday=3, tm_yday=0)
-    #DateTimeTup(tm_year=220, tm_mon=13, tm_mday=11, tm_hour=22, tm_min=41, tm_sec=15, tm_wday=4, tm_yday=345)
-    #DateTimeTup(tm_year=2023, tm_mon=12, tm_mday=14, tm_hour=21, tm_min=29, tm_sec=32, tm_wday=3, tm_yday=0)
-    #DateTimeTup(tm_year=220, tm_mon=13, tm_mday=11, tm_hour=22, tm_min=41, tm_sec=15, tm_wday=4, tm_yday=345)
-    #et = earth_time
-    earth_time = (2020, 12, 14, 22, 9, 10, 3, 348)
-    mst = MarsTime.from_earthtime(earth_time)
-    tm = make_struct_time(*earth_time)
-    print(time.mktime(tm) )
-    print(mst)
-    
-    earth_time = (2020, 12, 14, 22, 9, 20, 3, 348)
-    mst = MarsTime.from_earthtime(earth_time)
-    tm = make_struct_time(*earth_time)
-    print(time.mktime(tm) )
-    print(mst)
-    
-    earth_time = (2020, 12, 14, 22, 9, 30, 3, 348)
-    mst = MarsTime.from_earthtime(earth_time)
-    tm = make_struct_time(*earth_time)
-    print(time.mktime(tm) )
-    print(mst)
-    
-    while True:
-        earth_time = time.gmtime()
-        mst = MarsTime.from_earthtime(earth_time)
-        mars_time = MarsCal.from_earthtime(earth_time)
-        print(earth_time)
-        print(mst)
-        print(mars_time)
-        time.sleep(5)
-        break
-    #from ds3231_gen import DS3231
-    #ds3231 = DS3231()
-    
-    #while True:
-    #    earth_time = DateTimeTup(*ds3231.get_time())
-    #    mars_time = MarsCal.from_earthtime(earth_time)
-    #    print(mars_time)
-    #    time.sleep(3)
-    #earth_time = time.gmtime()
-    #mars_time = MarsCal.from_earthtime(earth_time)
-    #earth_dt = print_datetime(earth_time, EarthCal.date_names(earth_time))
-    #mars_dt = print_datetime(mars_time, MarsCal.date_names(mars_time))
-    #print('\n'.join(earth_dt))
-    #print('\n'.join(mars_dt))
+    # Bulk converter, see marsconvert
+    import marsconvert
+    marsconvert.main()
@@ -1,31 +1,183 @@
-import marstime
 import time
+_import_start = time.time_ns()
+import os
+import struct
+from array import array
+import marstime
+import eventstore
 import random
 
 facts_file = 'data/marsfacts.tsv'
 birthdays_file = 'data/birthdays.tsv'
 events_file = 'data/marsdates.tsv'
+# Pre-wrapped facts and events, built by compile_messages.py
+asset_file = 'data/messages.bin'
 
 
 line_length = (400//8)-4
 
 
-def select_messages(earth_date_now, mars_date_now):
-    """"""
+class LazyIndex:
+    """Runs loader to index a data file on first use, and again whenever the
+    file's size or modification time changes. A value with a close() method
+    is closed when it's replaced."""
+    def __init__(self, path, loader):
+        self.path = path
+        self.loader = loader
+        self.load_ms = None
+        self._stat = None
+        self._value = None
+
+    def get(self):
+        st = os.stat(self.path)
+        stat = (st[6], st[8])  # size, mtime
+        if stat != self._stat:
+            self.clear()
+            start = time.time_ns()
+            self._value = self.loader()
+            self._stat = stat
+            self.load_ms = (time.time_ns() - start) / 1e6
+        return self._value
+
+    def clear(self):
+        close = getattr(self._value, 'close', None)
+        if close is not None:
+            close()
+        self._stat = None
+        self._value = None
+
+
+class MessageAsset:
+    """Reads the pre-wrapped, pre-padded lines compiled by compile_messages.py.
+    Layout: the HEADER, a line count byte per record, a uint32 offset per record
+    (from the start of the lines), then the lines, line_length ascii bytes each.
+    Records are the facts sorted by line count, then each event's earth and mars messages,
+    by line in the events file. The sizes of the facts and events files are kept to tell
+    when the asset is out of date."""
+    HEADER = '<4sHHHHII'  # magic, line length, most lines in a record, facts, events, facts and events file sizes
+    MAGIC = b'MMS3'
+
+    def __init__(self, path):
+        self._fh = open(path, 'rb')
+        header = self._fh.read(struct.calcsize(MessageAsset.HEADER))
+        (magic, self.line_length, max_lines, self.facts, self.events,
+         self.facts_size, self.events_size) = struct.unpack(MessageAsset.HEADER, header)
+        if magic != MessageAsset.MAGIC:
+            raise ValueError('Not a message asset')
+        records = self.facts + 2 * self.events
+        self.line_counts = self._fh.read(records)
+        self.offsets = array('I', bytes(4 * records))
+        self._fh.readinto(self.offsets)
+        self._lines_start = self._fh.tell()
+        self._buf = bytearray(max_lines * self.line_length)
+        self._mvb = memoryview(self._buf)
+
+    def read(self, record):
+        """The lines of a record, read into the reused buffer"""
+        length = self.line_length
+        count = self.line_counts[record]
+        self._fh.seek(self._lines_start + self.offsets[record])
+        self._fh.readinto(self._mvb[:count * length])
+        return [str(self._buf[i:i + length], 'ascii') for i in range(0, count * length, length)]
+
+    def random_fact(self, max_line=None):
+        count = self.facts if max_line is None else marstime.bisect_right(self.line_counts, max_line, 0, self.facts)
+        if not count:
+            return None
+        return self.read(random.randint(0, count - 1))
+
+    @staticmethod
+    def _matches(path, size):
+        try:
+            return os.stat(path)[6] == size
+        except OSError:
+            return False
+
+    def matches_facts(self, path):
+        """If the facts were compiled from the file as it is now"""
+        return MessageAsset._matches(path, self.facts_size)
+
+    def matches_events(self, path):
+        """If the events were compiled from the file as it is now"""
+        return MessageAsset._matches(path, self.events_size)
+
+    def event(self, i, on_mars):
+        return self.read(self.facts + 2 * i + int(on_mars))
+
+    def close(self):
+        self._fh.close()
+
+asset_index = LazyIndex(asset_file, lambda: MessageAsset(asset_file))
+
+def get_asset():
+    """The compiled message asset, None if it hasn't been built or is from an older version"""
+    try:
+        return asset_index.get()
+    except (OSError, ValueError):
+        return None
+
+
+def select_messages(earth_date_now, mars_date_now, wrapped=False):
+    """Today's messages. If wrapped, as paragraphs of lines ready to draw,
+    taken from the compiled asset where possible."""
     #earth_date_now = make_datetime_tup(*map(int, edt.split('-')))
     #mars_date_now = marstime.MarsCal.from_earthtime(earth_date_now)
-    msgs = get_birthdays(earth_date_now, mars_date_now) + get_events(earth_date_now, mars_date_now)
+    msgs = get_birthdays(earth_date_now, mars_date_now, wrapped) + get_events(earth_date_now, mars_date_now, wrapped)
     if 0 < len(msgs) < 2:
-        msgs.append(get_random_fact(8))
+        msgs.append(get_random_fact(8, wrapped))
     if not msgs:
         if random.randint(0, 10) == 0:
             return None
-        msgs = [get_random_fact()]
-        if len(format_message(msgs[0])) <= 8:
-            msgs.append(get_random_fact(8))
+        msgs = [get_random_fact(wrapped=wrapped)]
+        if len(msgs[0] if wrapped else format_message(msgs[0])) <= 8:
+            msgs.append(get_random_fact(8, wrapped))
     return msgs
 
 
+class MessageQueue:
+    """Selects and wraps the messages for the coming mars hours ahead of time, during idle
+    time, so that drawing them doesn't wait on file reads and date conversions.
+    Holds at most `size` hours, the oldest are dropped first."""
+    def __init__(self, lookahead=2, size=4):
+        self.lookahead = lookahead
+        self.size = size
+        self._paragraphs = {}
+        self._keys = []
+
+    @staticmethod
+    def _hour(mars_time):
+        """Hours since sol 0"""
+        return marstime.MarsCal.to_marstime(mars_time)[0] * 24 + mars_time.tm_hour
+
+    def get(self, earth_time, mars_time):
+        """The paragraphs for now, precomputed if possible"""
+        hour = self._hour(mars_time)
+        if hour in self._paragraphs:
+            self._keys.remove(hour)
+            return self._paragraphs.pop(hour)
+        return select_messages(earth_time, mars_time, wrapped=True)
+
+    def precompute(self, mars_time):
+        """Fill in the next missing hour, returns False if there was nothing to do"""
+        now = self._hour(mars_time)
+        # Drop hours that have passed
+        for hour in [h for h in self._keys if h <= now]:
+            self._keys.remove(hour)
+            del self._paragraphs[hour]
+        for hour in range(now + 1, now + 1 + self.lookahead):
+            if hour not in self._paragraphs:
+                break
+        else:
+            return False
+        sol, sol_hour = divmod(hour, 24)
+        mars_time = marstime.MarsCal.from_marstime((sol, sol_hour, 0, 0))
+        self._paragraphs[hour] = select_messages(marstime.MarsCal.to_earthtime(mars_time), mars_time, wrapped=True)
+        self._keys.append(hour)
+        if len(self._keys) > self.size:
+            del self._paragraphs[self._keys.pop(0)]
+        return True
+
+
 def format_message(message):
     paragraph = []
     sentances = message.split('|')
@@ -64,84 +216,164 @@ def get_marsdate(year, month, day):
     
 
 ### Facts
-def count_facts():
-    with open(facts_file, 'r') as fh:
-        i = 0
-        for i, __ in enumerate(fh):
-            pass
-    return i
-
-facts_length = count_facts()
-
-def get_random_fact(max_line=None):
-    #if facts_length is None:
-    #    facts_length = count_facts()
-    target = random.randint(0, facts_length)
-    with open(facts_file, 'r') as fh:
-        for i, l in enumerate(fh):
-            if i == target:
-                l = l.strip()
-                break  
-        else:
-            l = 'Space, the final frontier...'
-    if max_line is not None and len(format_message(l)) > max_line:
-        l = get_random_fact(max_line)
-    return l
+def index_facts():
+    """Byte offsets of the facts, sorted by how many lines they wrap to,
+    and the matching line counts"""
+    facts = []
+    with open(facts_file, 'rb') as fh:
+        offset = 0
+        for l in fh:
+            fact = l.decode().strip()
+            if fact:
+                facts.append((len(format_message(fact)), offset))
+            offset += len(l)
+    facts.sort()
+    return [offset for __, offset in facts], [lines for lines, __ in facts]
+
+facts_index = LazyIndex(facts_file, index_facts)
+
+def get_random_fact(max_line=None, wrapped=False):
+    """A random fact, no more than max_line lines long once formatted"""
+    asset = get_asset() if wrapped else None
+    if asset is not None and asset.matches_facts(facts_file):
+        return asset.random_fact(max_line) or format_message('Space, the final frontier...')
+    fact_offsets, fact_lines = facts_index.get()
+    if max_line is None:
+        count = len(fact_offsets)
+    else:
+        count = marstime.bisect_right(fact_lines, max_line)
+    if not count:
+        fact = 'Space, the final frontier...'
+    else:
+        with open(facts_file, 'rb') as fh:
+            fh.seek(fact_offsets[random.randint(0, count - 1)])
+            fact = fh.readline().decode().strip()
+    return format_message(fact) if wrapped else fact
             
 
-### Birthdays
+### Date index
 
-def get_birthdays(earth_date_now, mars_date_now):
+def index_date(index, date, record):
+    """Add a record to an index of month-day: [records]"""
+    if not date:
+        return
+    year, mon_day = date.split('-', 1)
+    index.setdefault(mon_day, []).append((year, record))
+
+
+def lookup_dates(earth_index, mars_index, earth_date_now, mars_date_now):
+    """The (line number, year, record, on_mars) of today's entries, in file order.
+    If an entry matches both the earth and mars date, only the mars date is kept."""
     earth_mon_day = f'{earth_date_now.tm_mon:02d}-{earth_date_now.tm_mday:02d}'
     mars_mon_day = f'{mars_date_now.tm_mon:02d}-{mars_date_now.tm_mday:02d}'
-    
-    messages = []
+    found = {}
+    for year, record in earth_index.get(earth_mon_day, ()):
+        found[record[0]] = year, record, False
+    for year, record in mars_index.get(mars_mon_day, ()):
+        found[record[0]] = year, record, True
+    return [found[i] for i in sorted(found)]
+
+
+### Birthdays
+
+def load_birthdays():
+    """Index the birthdays by earth and by mars month-day"""
+    earth_index, mars_index = {}, {}
     with open(birthdays_file, 'r') as fh:
-        for l in fh:
+        for i, l in enumerate(fh):
             name, earth_date, mars_date = l.strip('\n').split('\t')
-            r = check_date(mars_date, mars_mon_day)
-            if r:
-                messages.append(format_mars_birthday_message(name, earth_date, mars_date_now))
-                continue
-            r = check_date(earth_date, earth_mon_day)
-            if r:
-                messages.append(format_earth_birthday_message(name, earth_date, mars_date_now))
+            record = (i, name, earth_date, mars_date)
+            index_date(earth_index, earth_date, record)
+            index_date(mars_index, mars_date, record)
+    return earth_index, mars_index
+
+birthdays_index = LazyIndex(birthdays_file, load_birthdays)
+
+
+def get_birthdays(earth_date_now, mars_date_now, wrapped=False):
+    messages = []
+    for year, (i, name, earth_date, mars_date), on_mars in lookup_dates(*birthdays_index.get(), earth_date_now, mars_date_now):
+        if on_mars:
+            messages.append(format_mars_birthday_message(name, earth_date, mars_date_now, mars_date))
+        else:
+            messages.append(format_earth_birthday_message(name, earth_date, mars_date_now, mars_date))
+    if wrapped:
+        messages = [format_message(m) for m in messages]
     return messages
 
 
-def format_earth_birthday_message(name, earth_bday, mars_date_now):
+def get_mars_birthday(earth_bday, mars_bday=None):
+    """The mars date of a birthday, from the stored mars date if there is one"""
+    if mars_bday:
+        return marstime.MarsCal.make_date(*map(int, mars_bday.split('-')))
     year, month, day = map(int, earth_bday.split('-'))
-    mars_bday = get_marsdate(year, month, day)
-    years_delta, months_delta, sols_delta = mars_timedelta(mars_bday, mars_date_now)
+    return get_marsdate(year, month, day)
+
+def format_earth_birthday_message(name, earth_bday, mars_date_now, mars_bday=None):
+    mars_bday = get_mars_birthday(earth_bday, mars_bday)
+    years_delta, months_delta, sols_delta = marstime.MarsCal.timedelta(mars_bday, mars_date_now)
     month_name, weekday = marstime.MarsCal.date_names(mars_bday)
     months_message = '' if months_delta == 0 else f" and {months_delta} month{'' if months_delta == 1 else 's'}"
     return ' '.join([f"Today is {name}'s birthday. On Mars, the date was {mars_bday.tm_mday} {month_name}, {mars_bday.tm_year}.",
                      f"In Mars time, {name} would be {years_delta} years{months_message} old."])
 
-def format_mars_birthday_message(name, earth_bday, mars_date_now):
-    year, month, day = map(int, earth_bday.split('-'))
-    mars_bday = get_marsdate(year, month, day)
-    years_delta, months_delta, sols_delta = mars_timedelta(mars_bday, mars_date_now)
+def format_mars_birthday_message(name, earth_bday, mars_date_now, mars_bday=None):
+    mars_bday = get_mars_birthday(earth_bday, mars_bday)
+    years_delta, months_delta, sols_delta = marstime.MarsCal.timedelta(mars_bday, mars_date_now)
     return f"If born on Mars, today would be {name}'s birthday. In Mars time, {name} would be {years_delta} years old."
 
 
 #### Historical events
 
-def get_events(earth_date_now, mars_date_now):
-    earth_mon_day = f'{earth_date_now.tm_mon:02d}-{earth_date_now.tm_mday:02d}'
-    mars_mon_day = f'{mars_date_now.tm_mon:02d}-{mars_date_now.tm_mday:02d}'
-    
-    messages = []
+def load_events():
+    """Index the events by earth and by mars month-day"""
+    earth_index, mars_index = {}, {}
     with open(events_file, 'r') as fh:
-        for l in fh:
+        for i, l in enumerate(fh):
             earth_date, mars_date, msg = l.strip('\n').split('\t')
-            r = check_date(mars_date, mars_mon_day)
-            if r:
-                messages.append(format_mars_event(r[0], earth_date, msg))
-                continue
-            r = check_date(earth_date, earth_mon_day)
-            if r:
-                messages.append(format_earth_event(r[0], msg))
+            record = (i, earth_date, msg)
+            index_date(earth_index, earth_date, record)
+            index_date(mars_index, mars_date, record)
+    return earth_index, mars_index
+
+events_index = LazyIndex(events_file, load_events)
+
+
+event_store_index = LazyIndex(eventstore.events_store_file, lambda: eventstore.EventStore(eventstore.events_store_file))
+
+def get_event_store():
+    """The event store built by eventstore.py, None if it hasn't been built or can't be read"""
+    try:
+        return event_store_index.get()
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def get_events(earth_date_now, mars_date_now, wrapped=False, store=None):
+    """Today's events, from store (an eventstore.EventStore) or data/events.bin if either
+    is there, otherwise from marsdates.tsv"""
+    if store is None:
+        store = get_event_store()
+    if store is None:
+        found = lookup_dates(*events_index.get(), earth_date_now, mars_date_now)
+        asset = get_asset() if wrapped else None
+        if asset is not None and not asset.matches_events(events_file):
+            # Edited since the asset was compiled, the line numbers may have moved
+            asset = None
+    else:
+        # The asset's events are numbered by line in marsdates.tsv, the store's may not be
+        found = store.lookup(earth_date_now, mars_date_now)
+        asset = None
+    messages = []
+    for year, (i, earth_date, msg), on_mars in found:
+        if asset is not None and i < asset.events:
+            messages.append(asset.event(i, on_mars))
+            continue
+        if on_mars:
+            message = format_mars_event(year, earth_date, msg)
+        else:
+            message = format_earth_event(year, msg)
+        messages.append(format_message(message) if wrapped else message)
     return messages
 
 def format_earth_event(year, msg):
@@ -154,3 +386,6 @@ def format_mars_event(year, earth_date, msg):
         return f"This sol in {year} ({earth_date.replace('-', '/')}), {msg}"
     return msg
 
+
+# How long importing this module took, the data files are only read on first use
+import_ms = (time.time_ns() - _import_start) / 1e6
@@ -0,0 +1,25 @@
+import time
+import birthdays
+import marstime
+
+
+def test_anniversary_index(tmp_path):
+    path = str(tmp_path / 'birthdays.tsv')
+    people = [('Gabe', 1990, 1, 4), ('Ma', 1957, 3, 21), ('Pa', 1955, 11, 7)]
+    with open(path, 'w') as fh:
+        fh.write('\n'.join('\t'.join(birthdays.get_birthday_record(*p)) for p in people))
+    mars_births = {name: mars for name, earth, mars in birthdays.read_birthdays(path)}
+    now = marstime.MarsTime.earthtime_2_seconds((2024, 1, 1))
+    index = birthdays.AnniversaryIndex.from_file(now, years=2, path=path)
+
+    earth = [(a.name, a.age) for a in index.upcoming(now, sols=355) if not a.on_mars]
+    assert earth == [('Gabe', 34), ('Ma', 67), ('Pa', 69)]
+    mars = [a for a in index.upcoming(now, sols=668) if a.on_mars]
+    assert sorted(a.name for a in mars) == ['Gabe', 'Ma', 'Pa']
+    for a in mars:
+        mars_time = marstime.MarsCal.from_earthtime(time.gmtime(int(a.start) + 1))
+        birth = mars_births[a.name]
+        assert (mars_time.tm_mon, mars_time.tm_mday) == birth[1:]
+        assert mars_time.tm_year - birth[0] == a.age
+
+    assert [a.name for a in index.upcoming(marstime.MarsTime.earthtime_2_seconds((2024, 1, 4, 12)))] == ['Gabe']
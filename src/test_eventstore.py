@@ -0,0 +1,55 @@
+import random
+import eventstore
+import marstime
+import messages
+
+
+def dates(months):
+    return [marstime.make_datetime_tup(2000, month, mday) for month in range(1, months + 1) for mday in range(1, 29)]
+
+
+def test_event_store_matches_tsv(tmp_path):
+    path = str(tmp_path / 'events.bin')
+    eventstore.build_event_store(messages.events_file, path, block_size=4)
+    store = eventstore.EventStore(path)
+    earth_index, mars_index = messages.load_events()
+    for earth_date, mars_date in zip(dates(12) * 2, dates(24)):
+        assert store.lookup(earth_date, mars_date) == messages.lookup_dates(earth_index, mars_index, earth_date, mars_date)
+        assert messages.get_events(earth_date, mars_date, store=store) == messages.get_events(earth_date, mars_date)
+    store.close()
+
+
+def test_event_store_blocks(tmp_path):
+    tsv_path, path = str(tmp_path / 'events.tsv'), str(tmp_path / 'events.bin')
+    rng = random.Random(4)
+    with open(tsv_path, 'w') as fh:
+        for i in range(5000):
+            earth = f'{rng.randint(1900, 2100)}-{rng.randint(1, 3):02d}-{rng.randint(1, 5):02d}'
+            mars = f'{rng.randint(100, 300)}-{rng.randint(1, 2):02d}-{rng.randint(1, 5):02d}' if i % 3 else ''
+            fh.write(f'{earth}\t{mars}\tEvent {i}\n')
+    assert eventstore.build_event_store(tsv_path, path, block_size=16) == 5000
+    store = eventstore.EventStore(path)
+    with open(tsv_path) as fh:
+        lines = [l.strip('\n').split('\t') for l in fh]
+    for month in range(1, 4):
+        for mday in range(1, 7):
+            key = f'-{month:02d}-{mday:02d}'
+            for on_mars in (0, 1):
+                found = [line for line, offset in store.find(eventstore.EventStore.date_key(month, mday), on_mars)]
+                assert found == [i for i, l in enumerate(lines) if l[on_mars].endswith(key)]
+    store.close()
+
+
+def test_broken_event_store(monkeypatch, tmp_path):
+    path = str(tmp_path / 'events.bin')
+    eventstore.build_event_store(messages.events_file, path)
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    earth_date, mars_date = marstime.make_datetime_tup(2000, 3, 20), marstime.make_datetime_tup(220, 1, 1)
+    expected = messages.get_events(earth_date, mars_date)
+    monkeypatch.setattr(messages, 'event_store_index', messages.LazyIndex(path, lambda: eventstore.EventStore(path)))
+    for broken in (data[:10], data[:-5], b'XXXX' + data[4:]):
+        with open(path, 'wb') as fh:
+            fh.write(broken)
+        assert messages.get_event_store() is None
+        assert messages.get_events(earth_date, mars_date) == expected
@@ -0,0 +1,44 @@
+import pytest
+import marstime
+
+np = pytest.importorskip('numpy')
+from marsarray import MarsCalArray, MarsTimeArray
+
+
+def test_earthseconds_matches_scalar():
+    seconds = np.linspace(-3e9, 4e9, 2001)
+    batch = MarsCalArray.from_earthseconds(seconds)
+    for i, s in enumerate(seconds):
+        mars_time = marstime.MarsCal.from_marstime(marstime.MarsTime.from_earthseconds(float(s)))
+        assert tuple(int(field[i]) for field in batch) == mars_time
+
+
+def test_to_earthseconds():
+    sols = np.arange(marstime.MarsCal.year_start(218), marstime.MarsCal.year_start(219))
+    zeros = np.zeros_like(sols)
+    mars_time = MarsCalArray.from_marstime((sols, zeros, zeros, zeros))
+    seconds = MarsCalArray.to_earthseconds(mars_time)
+    assert (np.diff(seconds) > 88775).all()
+    assert np.array_equal(MarsCalArray.from_earthseconds(seconds + 0.5).tm_yday, mars_time.tm_yday)
+
+
+def test_precise_mst():
+    seconds = np.arange(-6e9, 2e9, 1e6)
+    tt_utc = MarsTimeArray.tt_utc(seconds)
+    assert np.array_equal(tt_utc, [marstime.MarsTime.tt_utc(s) for s in seconds])
+    batch = MarsTimeArray.from_earthseconds(seconds, tt_utc=tt_utc)
+    assert [tuple(int(f[i]) for f in batch) for i in (0, 3000, 7999)] == [
+        marstime.MarsTime.from_earthseconds(float(seconds[i]), precise=True) for i in (0, 3000, 7999)]
+
+
+def test_date_arithmetic():
+    sols = np.arange(40000, 42000, 3)
+    dates = MarsCalArray.from_ordinal(sols)
+    assert np.array_equal(MarsCalArray.to_ordinal(dates), sols)
+    later = MarsCalArray.add_years(MarsCalArray.add_months(dates, 5), 2)
+    delta = MarsCalArray.timedelta(dates, later)
+    for i in range(0, len(sols), 37):
+        date = marstime.MarsCal.from_ordinal(int(sols[i]))
+        expected = marstime.MarsCal.add_years(marstime.MarsCal.add_months(date, 5), 2)
+        assert tuple(int(f[i]) for f in later) == expected
+        assert tuple(int(f[i]) for f in delta) == marstime.MarsCal.timedelta(date, expected)
@@ -0,0 +1,47 @@
+import io
+import pytest
+
+pytest.importorskip('numpy')
+import marsconvert
+
+
+def test_convert():
+    fh_in = io.StringIO('1607983750\n\n2020-12-14T22:09:10Z\n2020-12-14\n')
+    fh_out = io.StringIO()
+    assert marsconvert.convert(fh_in, fh_out, sep=',', chunk_size=2) == (3, 0)
+    assert fh_out.getvalue().splitlines() == [
+        'earth,sol,mtc,year,month,mday,wday,yday',
+        '1607983750,52240,06:29:28,218,23,4,4,617',
+        '2020-12-14T22:09:10Z,52240,06:29:28,218,23,4,4,617',
+        '2020-12-14,52239,08:55:52,218,23,3,3,616',
+    ]
+
+
+def test_convert_parallel(tmp_path):
+    path = tmp_path / 'timestamps.txt'
+    path.write_text('\n'.join(str(s) for s in range(0, 2000000000, 3456789)) + '\n2020-12-14')
+    serial, parallel = io.StringIO(), io.StringIO()
+    with open(path) as fh:
+        rows = marsconvert.convert(fh, serial, chunk_size=100)
+    assert marsconvert.convert_parallel(str(path), parallel, 3, chunk_size=100) == rows
+    assert rows[1] == 0
+    assert parallel.getvalue() == serial.getvalue()
+
+
+def test_convert_bad_lines():
+    fh_in = io.StringIO('garbage\n1607983750\n2020-13-45\nnan\n')
+    fh_out = io.StringIO()
+    assert marsconvert.convert(fh_in, fh_out, sep=',', chunk_size=3, header=False) == (4, 3)
+    assert fh_out.getvalue().splitlines() == [
+        'garbage,,,,,,,',
+        '1607983750,52240,06:29:28,218,23,4,4,617',
+        '2020-13-45,,,,,,,',
+        'nan,,,,,,,',
+    ]
+
+
+@pytest.mark.parametrize("data,parts", [(b'1\n22\n333\n', 2), (b'1\n22\n333', 5), (b'4444\n', 3)])
+def test_split_ranges(data, parts):
+    ranges = marsconvert.split_ranges(data, parts)
+    assert b''.join(data[start:end] for start, end in ranges) == data
+    assert all(data[end - 1:end] == b'\n' for start, end in ranges[:-1])
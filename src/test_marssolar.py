@@ -0,0 +1,24 @@
+import pytest
+import marstime
+import marssolar
+
+
+def test_mars24_example():
+    # Mars24 worked example, 2000-01-06 00:00:00 UTC
+    seconds = marstime.MarsTime.earthtime_2_seconds((2000, 1, 6))
+    assert marssolar.j2000_delta(seconds) == pytest.approx(4.5007428, abs=1e-6)
+    solar = marssolar.solar_quantities(seconds)
+    assert solar.ls == pytest.approx(277.18758, abs=1e-4)
+    assert marssolar.SEASONS[solar.season] == 'Winter'
+    assert solar.eot == pytest.approx(-5.18774, abs=1e-4)
+    assert solar.mtc == pytest.approx(23.99425, abs=1e-4)
+    assert solar.ltst == pytest.approx(23.64840, abs=1e-4)
+
+
+def test_solar_quantities_array():
+    np = pytest.importorskip('numpy')
+    seconds = np.linspace(0, 2e9, 101)
+    solar = marssolar.solar_quantities(seconds, west_longitude=137.4)
+    for i in (0, 50, 100):
+        expected = marssolar.solar_quantities(float(seconds[i]), west_longitude=137.4)
+        assert [float(f[i]) for f in solar] == pytest.approx(list(expected))
@@ -1,3 +1,4 @@
+import time
 import pytest
 import marstime
 
@@ -9,3 +10,199 @@ def test_marstime(earth_time, expected):
     mars_time = marstime.MarsTime.from_earthtime(earth_time)
     assert mars_time == expected
 
+
+
+def test_solday_2_year():
+    for sol_day in range(-400000, 400000, 97):
+        year, yearday = marstime.MarsCal.solday_2_year(sol_day)
+        assert 1 <= yearday <= marstime.MarsCal.year_length(year)
+        assert marstime.MarsCal.year_start(year) + yearday - 1 == sol_day
+
+
+def test_solday_2_year_table():
+    expected = [marstime.MarsCal.solday_2_year(sol) for sol in range(-2000, 2000)]
+    marstime.MarsCal.build_year_table(135, 150)
+    try:
+        assert [marstime.MarsCal.solday_2_year(sol) for sol in range(-2000, 2000)] == expected
+    finally:
+        marstime.MarsCal.clear_year_table()
+
+
+@pytest.mark.parametrize("year", [218, 219, 300, 500])
+def test_dayofyear_2_month(year):
+    yearday = 0
+    for month in range(1, 25):
+        assert marstime.MarsCal.intercalculate_days(month, year) == yearday
+        for mday in range(1, marstime.MarsCal.days_in_month(month, year) + 1):
+            yearday += 1
+            assert marstime.MarsCal.dayofyear_2_month(year, yearday) == (month, mday)
+    assert yearday == marstime.MarsCal.year_length(year)
+
+
+def test_ticker_advance():
+    start = 1702590889.0
+    ticker = marstime.MarsTicker(start)
+    for elapsed in [0.5, 30, 2000, 90000, 0.25]:
+        ticker.advance(elapsed)
+        start += elapsed
+        expected = marstime.MarsCal.from_marstime(marstime.MarsTime.from_earthseconds(start))
+        assert ticker.mars_time[:5] == expected[:5]
+
+
+@pytest.mark.parametrize("unit,field", [('second', 5), ('minute', 4), ('hour', 3), ('sol', 2)])
+def test_ticker_next_boundary(unit, field):
+    ticker = marstime.MarsTicker(1702590889.0)
+    boundary = ticker.next_boundary(unit)
+    before = marstime.MarsTicker(boundary - 1e-3).mars_time
+    after = marstime.MarsTicker(boundary + 1e-3).mars_time
+    assert before[field] != after[field]
+    assert after[field + 1:6] == (0,) * (5 - field)
+    assert ticker.mars_time[field] == before[field]
+
+
+def test_to_earthseconds():
+    for seconds in range(-2000000000, 2000000000, 9876543):
+        mars_time = marstime.MarsCal.from_marstime(marstime.MarsTime.from_earthseconds(seconds))
+        start = marstime.MarsCal.to_earthseconds(mars_time)
+        assert seconds - 1.0274912517 < start <= seconds
+        assert marstime.MarsCal.from_marstime(marstime.MarsTime.from_earthseconds(start + 1e-3)) == mars_time
+
+
+def test_to_earthtime_round_trip():
+    for sol in range(50000, 52000):
+        for hms in ((0, 0, 0), (12, 34, 56), (23, 59, 59)):
+            mars_time = marstime.MarsCal.from_marstime((sol,) + hms)
+            assert marstime.MarsCal.from_earthtime(marstime.MarsCal.to_earthtime(mars_time)) == mars_time
+    for seconds in range(-2000000000, 2000000000, 9876543):
+        mars_time = marstime.MarsCal.from_marstime(marstime.MarsTime.from_earthseconds(seconds))
+        assert marstime.MarsCal.from_earthtime(marstime.MarsCal.to_earthtime(mars_time)) == mars_time
+
+
+def test_earthtime_2_seconds():
+    for seconds in range(-5000000000, 5000000000, 12345677):
+        earth_time = time.gmtime(seconds)
+        assert marstime.MarsTime.earthtime_2_seconds(earth_time) == seconds
+        assert marstime.MarsTime.seconds_2_earthtime(seconds + 0.5) == tuple(earth_time[:8])
+
+
+@pytest.mark.parametrize("per_second", [1, 1000, 1000000])
+def test_from_earthticks(per_second):
+    for seconds in range(0, 2000000000, 7654321):
+        mst = marstime.MarsTime.from_earthticks(seconds * per_second, per_second)
+        assert 0 <= mst[4] < per_second
+        mars_seconds = marstime.MarsTime.earthseconds_2_marsseconds(seconds)
+        assert abs(mars_seconds - (mst[0] * 86400 + mst[1] * 3600 + mst[2] * 60 + mst[3] + mst[4] / per_second)) < 1 / per_second + 1e-5
+
+
+@pytest.mark.parametrize("earth_time,tt_utc", [
+    # Delta T before 1972, from the published values
+    ((1900, 1, 1), -2.7),
+    ((1930, 1, 1), 24.0),
+    ((1965, 1, 1), 35.7),
+    ((1971, 6, 1), 41.7),
+    ((1972, 6, 30, 23, 59, 59), 42.184),
+    ((1972, 7, 1), 43.184),
+    ((2000, 1, 6), 64.184),
+    ((2024, 1, 1), 69.184),
+])
+def test_tt_utc(earth_time, tt_utc):
+    seconds = marstime.MarsTime.earthtime_2_seconds(earth_time)
+    assert marstime.MarsTime.tt_utc(seconds) == pytest.approx(tt_utc, abs=0.5)
+
+
+def test_precise_mst():
+    # Mars24 example: 2000-01-06 00:00:00 UTC is MSD 44795.9998
+    seconds = marstime.MarsTime.earthtime_2_seconds((2000, 1, 6))
+    assert marstime.MarsTime.from_earthseconds(seconds, precise=True) == (44795, 23, 59, 39)
+
+
+def test_iter_sols():
+    start, end = marstime.MarsCal.year_start(298) + 600, marstime.MarsCal.year_start(302) + 5
+    assert list(marstime.MarsCal.iter_sols(start, end)) == [
+        marstime.MarsCal.from_marstime((sol, 0, 0, 0)) for sol in range(start, end)]
+    assert list(marstime.MarsCal.iter_sols(end, start)) == []
+
+
+@pytest.mark.parametrize("time_b,mask", [
+    ((2023, 12, 14, 21, 54, 49), 0),
+    ((2023, 12, 14, 21, 54, 50), marstime.DIFF_SEC),
+    ((2023, 12, 14, 22, 0, 0), marstime.DIFF_HOUR | marstime.DIFF_MIN | marstime.DIFF_SEC),
+    ((2024, 1, 1, 21, 54, 49), marstime.DIFF_YEAR | marstime.DIFF_MON | marstime.DIFF_MDAY),
+])
+def test_diff_datetimes(time_b, mask):
+    time_a = marstime.make_datetime_tup(2023, 12, 14, 21, 54, 49)
+    assert marstime.diff_datetimes(time_a, time_b) == mask
+    packed_a, packed_b = marstime.pack_datetime(time_a), marstime.pack_datetime(time_b)
+    assert marstime.unpack_datetime(packed_b) == time_b
+    assert marstime.diff_packed(packed_a, packed_b) == mask
+
+
+def test_sol_cache():
+    cache = marstime.MarsCal.sol_cache
+    marstime.MarsCal.sol_cache = marstime.SolCache(2)
+    try:
+        first = marstime.MarsCal.from_marstime((50000, 1, 2, 3))
+        assert marstime.MarsCal.from_marstime((50000, 4, 5, 6)) == first[:3] + (4, 5, 6) + first[6:]
+        marstime.MarsCal.from_marstime((50001, 0, 0, 0))
+        marstime.MarsCal.from_marstime((50002, 0, 0, 0))
+        assert marstime.MarsCal.from_marstime((50000, 1, 2, 3)) == first
+        assert (marstime.MarsCal.sol_cache.hits, marstime.MarsCal.sol_cache.misses) == (1, 4)
+    finally:
+        marstime.MarsCal.sol_cache = cache
+
+
+def test_date_format():
+    earth_time = marstime.DateTimeTup(2023, 12, 14, 21, 4, 9, 3, 348)
+    mars_time = marstime.MarsCal.from_earthtime(earth_time)
+    assert marstime.EarthCal.print_datetime(earth_time) == marstime.print_datetime(
+        earth_time, marstime.EarthCal.date_names(earth_time))
+    assert marstime.MarsCal.print_datetime(mars_time) == marstime.print_datetime(
+        mars_time, marstime.MarsCal.date_names(mars_time))
+    fmt = marstime.DateFormat('%A %e %B %Y {%j} %H:%M:%S %P 100%%', marstime.EarthCal)
+    assert fmt(earth_time) == 'Thursday 14 December 2023 {348} 21:04:09 9pm 100%'
+    with pytest.raises(ValueError):
+        marstime.DateFormat('%B')
+
+
+def test_load_year_table(tmp_path):
+    path = str(tmp_path / 'yearstarts.bin')
+    assert not marstime.MarsCal.load_year_table(path)
+    expected = [marstime.MarsCal.solday_2_year(sol) for sol in range(-5000, 5000, 7)]
+    marstime.MarsCal.write_year_table(path, -10000, 10000)
+    try:
+        assert marstime.MarsCal.load_year_table(path)
+        assert [marstime.MarsCal.solday_2_year(sol) for sol in range(-5000, 5000, 7)] == expected
+        assert marstime.MarsCal.year_table_leaps[10218] == marstime.MarsCal.is_leap_year(218)
+        if marstime.mmap is not None:
+            mm = marstime.MarsCal._year_table_map[0]
+            assert marstime.MarsCal.load_year_table(path)
+            assert mm.closed and not marstime.MarsCal._year_table_map[0].closed
+            mm = marstime.MarsCal._year_table_map[0]
+            marstime.MarsCal.clear_year_table()
+            assert mm.closed
+    finally:
+        marstime.MarsCal.clear_year_table()
+
+
+@pytest.mark.parametrize("date_a,date_b,delta", [
+    ((218, 5, 10), (218, 5, 10), (0, 0, 0)),
+    ((218, 5, 10), (219, 5, 10), (1, 0, 0)),
+    ((218, 5, 10), (219, 5, 9), (0, 23, 27)),
+    ((218, 5, 28), (218, 7, 1), (0, 1, 0)),
+    ((219, 24, 28), (220, 1, 1), (0, 0, 1)),
+    ((218, 24, 27), (220, 1, 1), (1, 0, 2)),
+])
+def test_timedelta(date_a, date_b, delta):
+    date_a, date_b = marstime.MarsCal.make_date(*date_a), marstime.MarsCal.make_date(*date_b)
+    assert marstime.MarsCal.timedelta(date_a, date_b) == delta
+
+
+def test_date_arithmetic():
+    start = marstime.MarsCal.make_date(219, 24, 28, 1, 2, 3)  # Leap day
+    assert marstime.MarsCal.to_ordinal(marstime.MarsCal.add_sols(start, 1)) == marstime.MarsCal.to_ordinal(start) + 1
+    assert marstime.MarsCal.add_sols(start, 1) == marstime.MarsCal.make_date(220, 1, 1, 1, 2, 3)
+    assert marstime.MarsCal.add_years(start, 3) == marstime.MarsCal.make_date(222, 24, 27, 1, 2, 3)
+    assert marstime.MarsCal.add_months(start, -23) == marstime.MarsCal.make_date(219, 1, 28, 1, 2, 3)
+    sol = marstime.MarsCal.to_ordinal(start)
+    assert marstime.MarsCal.from_ordinal(sol, 1, 2, 3) == start
+    assert marstime.MarsCal.sols_between(marstime.MarsCal.make_date(219, 1, 1), start) == 668
@@ -0,0 +1,166 @@
+import shutil
+import compile_messages
+import marstime
+import messages
+
+
+def use_copies(monkeypatch, tmp_path):
+    """Point messages at copies of the facts and events files and an asset compiled from them"""
+    facts_path, events_path = str(tmp_path / 'marsfacts.tsv'), str(tmp_path / 'marsdates.tsv')
+    asset_path = str(tmp_path / 'messages.bin')
+    shutil.copy(messages.facts_file, facts_path)
+    shutil.copy(messages.events_file, events_path)
+    monkeypatch.setattr(messages, 'facts_file', facts_path)
+    monkeypatch.setattr(messages, 'facts_index', messages.LazyIndex(facts_path, messages.index_facts))
+    monkeypatch.setattr(messages, 'events_file', events_path)
+    monkeypatch.setattr(messages, 'events_index', messages.LazyIndex(events_path, messages.load_events))
+    monkeypatch.setattr(messages, 'asset_index', messages.LazyIndex(asset_path, lambda: messages.MessageAsset(asset_path)))
+    compile_messages.compile_messages(asset_path)
+    return facts_path, events_path
+
+
+def test_stale_asset(monkeypatch, tmp_path):
+    facts_path, events_path = use_copies(monkeypatch, tmp_path)
+    earth_date = marstime.make_datetime_tup(2000, 3, 20)
+    mars_date = marstime.make_datetime_tup(220, 1, 1)
+
+    def wrapped_events():
+        return [messages.format_message(m) for m in messages.get_events(earth_date, mars_date)]
+
+    assert messages.get_events(earth_date, mars_date, wrapped=True) == wrapped_events()
+    with open(events_path) as fh:
+        lines = fh.readlines()
+    with open(events_path, 'w') as fh:
+        fh.writelines(['-03-20\t\tInserted before the rest.\n'] + lines + ['-03-20\t\tAppended after the rest.\n'])
+    assert not messages.get_asset().matches_events(events_path)
+    assert messages.get_events(earth_date, mars_date, wrapped=True) == wrapped_events()
+    assert len(wrapped_events()) == 4
+
+    assert messages.get_asset().matches_facts(facts_path)
+    with open(facts_path, 'w') as fh:
+        fh.write('The only fact left.\n')
+    assert not messages.get_asset().matches_facts(facts_path)
+    assert messages.get_random_fact(wrapped=True) == messages.format_message('The only fact left.')
+
+
+class Loaded:
+    def __init__(self, text):
+        self.text = text
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_lazy_index_reloads(tmp_path):
+    path = str(tmp_path / 'data.tsv')
+    with open(path, 'w') as fh:
+        fh.write('one\n')
+    loads = []
+
+    def loader():
+        with open(path) as fh:
+            loads.append(Loaded(fh.read()))
+        return loads[-1]
+
+    index = messages.LazyIndex(path, loader)
+    assert index.get().text == 'one\n'
+    assert index.get() is loads[0] and len(loads) == 1
+    with open(path, 'w') as fh:
+        fh.write('one\ntwo\n')
+    assert index.get().text == 'one\ntwo\n'
+    assert len(loads) == 2 and loads[0].closed and not loads[1].closed
+    index.clear()
+    assert loads[1].closed
+    assert index.get().text == 'one\ntwo\n' and len(loads) == 3
+
+
+def test_message_queue(monkeypatch):
+    monkeypatch.setattr(messages, 'select_messages', lambda earth, mars, wrapped=False: (earth, mars))
+    sol = 50000
+
+    def at(hour):
+        return marstime.MarsCal.from_marstime((sol, hour, 0, 0))
+
+    queue = messages.MessageQueue(lookahead=2, size=3)
+    assert queue.precompute(at(5)) and queue.precompute(at(5))
+    assert not queue.precompute(at(5))
+    assert [h % 24 for h in queue._keys] == [6, 7]
+    earth, mars = queue._paragraphs[queue._keys[0]]
+    assert mars == at(6)
+    assert marstime.MarsCal.from_earthtime(earth)[:5] == at(6)[:5]
+
+    # Eviction of the oldest hour past size
+    queue.lookahead = 4
+    assert queue.precompute(at(5)) and queue.precompute(at(5))
+    assert [h % 24 for h in queue._keys] == [7, 8, 9]
+    # Hours that have passed are dropped, get pops a precomputed hour
+    assert queue.precompute(at(8))
+    assert [h % 24 for h in queue._keys] == [9, 10]
+    assert queue.get(None, at(9))[1] == at(9)
+    assert [h % 24 for h in queue._keys] == [10]
+    assert queue.get('earth', at(11)) == ('earth', at(11))
+
+
+def test_random_fact_max_line():
+    offsets, line_counts = messages.index_facts()
+    assert line_counts == sorted(line_counts)
+    with open(messages.facts_file, 'rb') as fh:
+        for offset, lines in zip(offsets, line_counts):
+            fh.seek(offset)
+            assert len(messages.format_message(fh.readline().decode().strip())) == lines
+    for __ in range(200):
+        assert len(messages.format_message(messages.get_random_fact(8))) <= 8
+        assert len(messages.get_random_fact(8, wrapped=True)) <= 8
+    assert messages.get_random_fact(0) == 'Space, the final frontier...'
+    assert messages.get_random_fact(0, wrapped=True) == messages.format_message('Space, the final frontier...')
+
+
+def scan_dates(path, earth_date_now, mars_date_now, date_columns):
+    """The old linear scan: (line, on_mars) of today's lines, a mars date wins over an earth one"""
+    earth_mon_day = f'{earth_date_now.tm_mon:02d}-{earth_date_now.tm_mday:02d}'
+    mars_mon_day = f'{mars_date_now.tm_mon:02d}-{mars_date_now.tm_mday:02d}'
+    found = []
+    with open(path) as fh:
+        for i, l in enumerate(fh):
+            fields = l.strip('\n').split('\t')
+            earth_date, mars_date = (fields[c] for c in date_columns)
+            if messages.check_date(mars_date, mars_mon_day):
+                found.append((i, True))
+            elif messages.check_date(earth_date, earth_mon_day):
+                found.append((i, False))
+    return found
+
+
+def test_lookup_dates_matches_scan(tmp_path):
+    path = str(tmp_path / 'dates.tsv')
+    with open(path, 'w') as fh:
+        fh.write('2001-03-20\t\tEarth only\n\t220-01-01\tMars only\n2002-03-20\t221-01-01\tBoth match\n'
+                 '2003-04-01\t221-01-01\tMars match\n2004-03-20\t221-02-02\tEarth match\n')
+    earth_index, mars_index = {}, {}
+    with open(path) as fh:
+        for i, l in enumerate(fh):
+            earth_date, mars_date, msg = l.strip('\n').split('\t')
+            messages.index_date(earth_index, earth_date, (i, msg))
+            messages.index_date(mars_index, mars_date, (i, msg))
+    earth_date, mars_date = marstime.make_datetime_tup(2000, 3, 20), marstime.make_datetime_tup(220, 1, 1)
+    found = [(record[0], on_mars) for year, record, on_mars in
+             messages.lookup_dates(earth_index, mars_index, earth_date, mars_date)]
+    assert found == scan_dates(path, earth_date, mars_date, (0, 1))
+    assert found == [(0, False), (1, True), (2, True), (3, True), (4, False)]
+
+
+def test_events_and_birthdays_match_scan():
+    events_index, birthdays_index = messages.load_events(), messages.load_birthdays()
+    matches = 0
+    for earth_date in [marstime.make_datetime_tup(2000, m, d) for m in range(1, 13) for d in range(1, 32)]:
+        mars_date = marstime.MarsCal.from_earthtime(earth_date)
+        events = messages.lookup_dates(*events_index, earth_date, mars_date)
+        assert [(record[0], on_mars) for year, record, on_mars in events] == \
+            scan_dates(messages.events_file, earth_date, mars_date, (0, 1))
+        birthdays = messages.lookup_dates(*birthdays_index, earth_date, mars_date)
+        assert [(record[0], on_mars) for year, record, on_mars in birthdays] == \
+            scan_dates(messages.birthdays_file, earth_date, mars_date, (1, 2))
+        assert len(messages.get_birthdays(earth_date, mars_date)) == len(birthdays)
+        matches += len(events) + len(birthdays)
+    assert matches > 100